@@ -0,0 +1,288 @@
+# This script solves a stream of instances without a display: every
+# line of the input is one json instance (problem1, problem1_2, problem2
+# or problem3), the instances go to a pool of worker processes that
+# build and solve them with the functions of the scripts, and every
+# result is written as one json line as soon as it is done. The input is
+# read as workers become free, so no more than one instance per worker
+# is in flight; an instance running past its timeout has its worker
+# killed (with the solver it started) and replaced
+import matplotlib
+matplotlib.use('Agg')
+import os
+import sys
+import json
+import time
+import queue
+import signal
+import argparse
+import traceback
+import multiprocessing
+import numpy as np
+import pandas as pd
+import pyomo.environ as pyo
+import problem1_2
+import problem2
+import problem3
+from job_table import JobTable, loadJobs
+from solver_config import SolverConfig
+from solver_portfolio import buildProblem1, buildProblem1_2, buildProblem2
+from instrument import solverStats
+
+# seconds a worker gets past the timeout to stop its solver by itself
+GRACE = 5
+
+# instances, one json object per line; id is echoed back, timeout in
+# seconds (the run's default without it) and solver holds SolverConfig
+# arguments:
+# {"id": "a", "problem": "problem1", "jobs": [{"job": "job_1", "process_time": 10,
+#     "setup_time": 2, "release_time": 0, "deadline": 15}, ...], "solver": {"name": "glpk"}}
+# {"id": "b", "problem": "problem1_2", "file": "jobs.csv", "timeout": 60}
+# {"id": "c", "problem": "problem2", "file": "data.xlsx", "targets": [35, 18844, 5163.69]}
+# {"id": "d", "problem": "problem3", "cars": [4, 4.5, 5], "loops": 25, "maxIter": 100,
+#     "alpha": 0.75, "sideMax": null, "lanes": 2, "seed": 0}
+
+
+def readJobTable(instance):
+    # jobs of an instance, inline or from a csv file
+    if 'file' in instance:
+        return loadJobs(instance['file'])
+    return JobTable.fromFrame(pd.DataFrame(instance['jobs']))
+
+
+def jobOrder(model):
+    # job sequence following the chosen arcs from the dummy start
+    after = {j1: j2 for (j1, j2), v in model.varSeq.items() if v.value is not None and v.value > 0.5}
+    order = []
+    j = after.get('')
+    while j is not None and j not in order:
+        order.append(j)
+        j = after.get(j)
+    return order
+
+
+def solveProblem1(instance, config):
+    dict_job = readJobTable(instance)
+    model = buildProblem1(dict_job)
+    result = config.solve(model, load_solutions=False)
+    output = solverStats(result)
+    if len(result.solution) > 0:
+        model.solutions.load_from(result)
+        output.update(order=jobOrder(model),
+            start={j: model.varStart[j].value for j in dict_job},
+            delay=sum(model.varDelay[j].value for j in dict_job), makespan=model.varMakeSpan.value)
+    return output
+
+
+def solveProblem1_2(instance, config):
+    # delay, then makespan under that delay, on the same model
+    dict_job = readJobTable(instance)
+    model = buildProblem1_2(dict_job)
+    result = config.solve(model, load_solutions=False)
+    if len(result.solution) == 0:
+        return solverStats(result)
+    model.solutions.load_from(result)
+    problem1_2.fixDelay(model, dict_job, pyo.value(model.obj1) + 1e-6)
+    result = config.solve(model, load_solutions=False)
+    output = solverStats(result)
+    if len(result.solution) > 0:
+        model.solutions.load_from(result)
+        output.update(order=jobOrder(model),
+            start={j: model.varTime[j].value for j in dict_job},
+            delay=sum(model.varDelay[j].value for j in dict_job), makespan=model.varMakeSpan.value)
+    return output
+
+
+def solveProblem2(instance, config):
+    # plan of pipes meeting the targets, the CONTAINERS, WEIGHT and
+    # VOLUME of the shipment without them
+    if 'file' in instance:
+        df_containers = problem2.readContainers(instance['file'])
+    else:
+        df_containers = pd.DataFrame(instance['containers'])
+    containers = problem2.Containers(df_containers)
+    targets = instance.get('targets')
+    model = buildProblem2(containers, tuple(targets) if targets is not None else None)
+    result = config.solve(model, load_solutions=False)
+    output = solverStats(result)
+    if len(result.solution) > 0:
+        model.solutions.load_from(result)
+        output.update(plan=[list(cop) for cop, v in model.varPipes.items() if v.value > 0.5])
+    return output
+
+
+def solveProblem3(instance, config):
+    # grasp split of the cars, lengths inline or as car records
+    cars = instance['cars']
+    if cars and isinstance(cars[0], dict):
+        df_cars = pd.DataFrame(cars)
+    else:
+        df_cars = pd.DataFrame({'car': np.arange(1, len(cars) + 1), 'length': cars})
+    lanes = instance.get('lanes', 2)
+    df_bestSol = problem3.loopGRASP(df_cars, instance.get('loops', 25), instance.get('maxIter', 100),
+        instance.get('alpha', 0.75), instance.get('sideMax'), seed=instance.get('seed'),
+        lanes=lanes, plot=False)
+    cost = problem3.calculateCost(df_bestSol, lanes)
+    return dict(status='heuristic', objective=float(cost[0]), sides=[float(c) for c in cost[1:]],
+        side=dict(zip(df_bestSol['car'].tolist(), df_bestSol['side'].tolist())))
+
+
+SOLVE = {
+    'problem1': solveProblem1,
+    'problem1_2': solveProblem1_2,
+    'problem2': solveProblem2,
+    'problem3': solveProblem3}
+
+
+def solveInstance(instance, timeout=None):
+    # result record of one instance, the error text when it fails; the
+    # solver time limit is the timeout unless the instance sets one
+    tic = time.perf_counter()
+    output = dict(id=instance.get('id'), problem=instance.get('problem'))
+    try:
+        if instance.get('problem') not in SOLVE:
+            raise ValueError('unknown problem: {}'.format(instance.get('problem')))
+        solver = dict(instance.get('solver') or {})
+        solver.setdefault('timeLimit', instance.get('timeout', timeout))
+        output.update(SOLVE[instance['problem']](instance, SolverConfig(**solver)))
+    except Exception as error:
+        output.update(status='error', error='{}: {}'.format(type(error).__name__, error),
+            trace=traceback.format_exc(limit=3))
+    output['seconds'] = time.perf_counter() - tic
+    return output
+
+
+def _batchWorker(w, tasks, results, timeout):
+    # solve the instances sent to this worker until None comes; the
+    # worker leads its own process group and its output goes nowhere,
+    # so solver logs and prints can't mix with the results
+    os.setsid()
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        seq, instance = task
+        results.put((w, seq, solveInstance(instance, timeout)))
+
+
+class _Slot():
+    # a worker process, its task queue and the instance it runs
+    def __init__(self, w, results, timeout):
+        self.tasks = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=_batchWorker, args=(w, self.tasks, results, timeout))
+        self.process.start()
+        self.seq = None
+        self.instance = None
+        self.started = None
+
+    def kill(self):
+        if self.process.is_alive():
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+            self.process.kill()
+        self.process.join()
+
+
+def readInstances(stream):
+    # instances of a json lines stream, a line that doesn't parse comes
+    # back as an error record
+    for k, line in enumerate(stream):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            instance = json.loads(line)
+            if not isinstance(instance, dict):
+                raise ValueError('an instance is a json object')
+        except ValueError as error:
+            instance = dict(error='line {}: {}'.format(k + 1, error))
+        yield instance
+
+
+def solveBatch(instances, out, workers=None, timeout=None):
+    # solve the instances on workers processes and write every result
+    # to out as a json line in completion order; an instance without a
+    # result timeout + GRACE seconds after it started is reported as a
+    # timeout and its worker replaced. Returns the number of results
+    workers = workers or os.cpu_count()
+    results = multiprocessing.Queue()
+    slots = [_Slot(w, results, timeout) for w in range(workers)]
+    instances = iter(instances)
+    pending = True
+    count = 0
+    seq = 0
+
+    def write(output):
+        out.write(json.dumps(output, default=str) + '\n')
+        out.flush()
+
+    try:
+        while True:
+            # hand out instances to the free workers
+            for slot in slots:
+                while pending and slot.seq is None:
+                    instance = next(instances, None)
+                    if instance is None:
+                        pending = False
+                    elif 'error' in instance and 'problem' not in instance:
+                        write(dict(id=None, status='error', error=instance['error']))
+                        count += 1
+                    else:
+                        seq += 1
+                        slot.seq, slot.instance, slot.started = seq, instance, time.perf_counter()
+                        slot.tasks.put((seq, instance))
+            if not pending and all(slot.seq is None for slot in slots):
+                break
+
+            try:
+                w, done, output = results.get(timeout=0.2)
+                if slots[w].seq == done:
+                    write(output)
+                    count += 1
+                    slots[w].seq = slots[w].instance = None
+            except queue.Empty:
+                pass
+
+            # replace the workers past their timeout or dead
+            now = time.perf_counter()
+            for w, slot in enumerate(slots):
+                if slot.seq is None:
+                    continue
+                limit = slot.instance.get('timeout', timeout)
+                late = limit is not None and now - slot.started > limit + GRACE
+                if late or not slot.process.is_alive():
+                    slot.kill()
+                    write(dict(id=slot.instance.get('id'), problem=slot.instance.get('problem'),
+                        status='timeout' if late else 'error', seconds=now - slot.started,
+                        error=None if late else 'worker exited with code {}'.format(slot.process.exitcode)))
+                    count += 1
+                    slots[w] = _Slot(w, results, timeout)
+    finally:
+        for slot in slots:
+            if slot.process.is_alive() and slot.seq is None:
+                slot.tasks.put(None)
+        for slot in slots:
+            slot.process.join(timeout=1)
+            slot.kill()
+    return count
+
+
+if __name__ == '__main__':
+    # instances from a json lines file (- for stdin) to a json lines
+    # file (stdout by default)
+    parser = argparse.ArgumentParser(description='solve a json lines stream of instances')
+    parser.add_argument('instances', help='json lines file of instances, - for stdin')
+    parser.add_argument('results', nargs='?', default='-', help='json lines file of results, - for stdout')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--timeout', type=float, default=None, help='seconds per instance')
+    args = parser.parse_args()
+
+    source = sys.stdin if args.instances == '-' else open(args.instances)
+    target = sys.stdout if args.results == '-' else open(args.results, 'w')
+    tic = time.perf_counter()
+    with source, target:
+        count = solveBatch(readInstances(source), target, args.workers, args.timeout)
+    print('{} results in {:.2f}s'.format(count, time.perf_counter() - tic), file=sys.stderr)
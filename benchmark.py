@@ -0,0 +1,246 @@
+# This script times the cases on generated instances of growing size:
+# every run writes its instance to a file the way the scripts read them,
+# then times loading it, building the model, solving, extracting the
+# solution and plotting as separate phases. Each run appends one json
+# line to the history file with the commit it ran on, so the runs of two
+# commits can be compared phase by phase
+import os
+import json
+import time
+import platform
+import tempfile
+import subprocess
+import datetime
+import pandas as pd
+import pyomo.environ as pyo
+from contextlib import contextmanager
+from matplotlib import pyplot as plt
+import problem1
+import problem1_2
+import problem2
+import problem3
+from job_table import loadJobs
+from schedule_bounds import ArcIndex
+from schedule_heuristic import heuristicSchedule
+from solver_config import SolverConfig, loadSolution
+from instance_gen import (generateJobs, generateContainers, generateCars,
+    writeJobs, writeContainers, writeCars)
+
+HISTORY = 'benchmark_history.jsonl'
+
+# instance sizes: jobs, containers and cars
+SIZES = {
+    'problem1': [6, 8, 10],
+    'problem1_2': [6, 8, 10],
+    'problem2': [35, 70, 140],
+    'problem3': [15, 100, 1000]}
+
+
+@contextmanager
+def phase(times, name):
+    # wall clock seconds of the block into times[name]
+    tic = time.perf_counter()
+    try:
+        yield
+    finally:
+        times[name] = time.perf_counter() - tic
+
+
+def runProblem1(size, seed, folder, config, tightness=0.5):
+    # problem1 as in its main: heuristic incumbent, pruned arcs, cutoff
+    times = {}
+    path = os.path.join(folder, 'jobs_{}_{}.csv'.format(size, seed))
+    writeJobs(generateJobs(size, tightness, seed), path)
+    with phase(times, 'load'):
+        dict_job = loadJobs(path, cache=False)
+        df_jobs = dict_job.toFrame()
+    with phase(times, 'build'):
+        order, _, _, _, (heurCost, _) = heuristicSchedule(dict_job)
+        model = pyo.ConcreteModel()
+        problem1.buildVars(model, dict_job, ArcIndex(dict_job, maxDelay=heurCost/99))
+        problem1.buildConstraints(model, dict_job)
+        problem1.buildObjective(model, dict_job)
+        problem1.loadStart(model, dict_job, order)
+        problem1.addCutoff(model, heurCost)
+    with phase(times, 'solve'):
+        result = config.solve(model, load_solutions=False)
+        loaded = loadSolution(model, result)
+    with phase(times, 'extract'):
+        df_varTime, _ = problem1.solutionToPandas(model, None)
+    with phase(times, 'plot'):
+        problem1.plotSolution(df_jobs, df_varTime)
+        plt.close('all')
+    objective = pyo.value(model.obj1) if loaded else None
+    return times, str(result.solver.termination_condition), objective
+
+
+def runProblem1_2(size, seed, folder, config, tightness=0.5):
+    # problem1_2 as in its main: delay, then makespan under that delay
+    times = {}
+    path = os.path.join(folder, 'jobs_{}_{}.csv'.format(size, seed))
+    writeJobs(generateJobs(size, tightness, seed), path)
+    with phase(times, 'load'):
+        dict_job = loadJobs(path, cache=False)
+        df_jobs = dict_job.toFrame()
+    with phase(times, 'build'):
+        order, _, heurDelay, _, _ = heuristicSchedule(dict_job, lexicographic=True)
+        model = pyo.ConcreteModel()
+        problem1_2.buildVars(model, dict_job, ArcIndex(dict_job, maxDelay=heurDelay))
+        problem1_2.buildConstraints(model, dict_job)
+        problem1_2.buildObjective(model, dict_job)
+        problem1_2.loadStart(model, dict_job, order)
+        problem1_2.addCutoff(model, heurDelay)
+        model.obj2.deactivate()
+    with phase(times, 'solve'):
+        result = config.solve(model, load_solutions=False)
+        loaded = loadSolution(model, result)
+        if loaded:
+            problem1_2.fixDelay(model, dict_job, pyo.value(model.obj1) + 1e-6)
+            result = config.solve(model, load_solutions=False)
+            loaded = loadSolution(model, result)
+    with phase(times, 'extract'):
+        df_varTime, _ = problem1_2.solutionToPandas(model, None)
+    with phase(times, 'plot'):
+        problem1_2.plotSolution(df_jobs, df_varTime)
+        plt.close('all')
+    # the delay reached by the makespan solve, not the bound fixDelay set
+    objective = [sum(model.varDelay[j].value for j in dict_job), model.varMakeSpan.value] if loaded else None
+    return times, str(result.solver.termination_condition), objective
+
+
+def runProblem2(size, seed, folder, config):
+    # problem2 on a manifest of size containers and feasible targets,
+    # it has no plot
+    times = {}
+    path = os.path.join(folder, 'containers_{}_{}.xlsx'.format(size, seed))
+    df_containers, targets = generateContainers(size, seed=seed)
+    writeContainers(df_containers, path)
+    with phase(times, 'load'):
+        containers = problem2.Containers(problem2.readContainers(path, cache=False))
+    with phase(times, 'build'):
+        model = pyo.ConcreteModel()
+        problem2.buildVars(model, containers)
+        problem2.buildConstraints(model, containers, targets=targets)
+    with phase(times, 'solve'):
+        result = config.solve(model, load_solutions=False)
+        loaded = loadSolution(model, result)
+    with phase(times, 'extract'):
+        df_varPipes = problem2.solutionToPandas(model, containers, None)
+    objective = len(df_varPipes) if loaded else None
+    return times, str(result.solver.termination_condition), objective
+
+
+def runProblem3(size, seed, folder, config, loops=25, maxIter=100, alpha=0.75):
+    # problem3 grasp on size cars, no model to build nor solver to use
+    times = {}
+    path = os.path.join(folder, 'cars_{}_{}.csv'.format(size, seed))
+    writeCars(generateCars(size, seed), path)
+    with phase(times, 'load'):
+        df_cars = pd.read_csv(path)
+    with phase(times, 'solve'):
+        df_bestSol = problem3.loopGRASP(df_cars, loops, maxIter, alpha, seed=seed, plot=False)
+    with phase(times, 'extract'):
+        cost = problem3.calculateCost(df_bestSol)
+    with phase(times, 'plot'):
+        problem3.plotSolution(df_bestSol)
+        plt.close('all')
+    return times, 'heuristic', float(cost[0])
+
+
+RUNNERS = {
+    'problem1': runProblem1,
+    'problem1_2': runProblem1_2,
+    'problem2': runProblem2,
+    'problem3': runProblem3}
+
+
+def gitCommit():
+    # short hash of HEAD and whether tracked files changed, None
+    # outside of a git checkout
+    folder = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=folder,
+            capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=folder,
+            capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def runBenchmark(problems=None, sizes=None, seeds=(0,), config=None, timeLimit=None, history=HISTORY):
+    # run every problem at every size and seed, sizes maps problems to
+    # their sizes (SIZES without it) and the solves use config (glpk
+    # without it), each capped at timeLimit seconds when given; every
+    # run is appended to the history file as it finishes and the runs
+    # are returned as a dataframe
+    problems = list(RUNNERS) if problems is None else problems
+    sizes = dict(SIZES, **(sizes or {}))
+    commit, dirty = gitCommit()
+    config = SolverConfig('glpk') if config is None else config
+    if timeLimit is not None:
+        config = config.limited(timeLimit)
+
+    records = []
+    with tempfile.TemporaryDirectory() as folder:
+        for problem in problems:
+            for size in sizes[problem]:
+                for seed in seeds:
+                    times, status, objective = RUNNERS[problem](size, seed, folder, config)
+                    record = {
+                        'commit': commit, 'dirty': dirty,
+                        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                        'host': platform.node(), 'problem': problem, 'size': size, 'seed': seed,
+                        'solver': repr(config) if problem != 'problem3' else None,
+                        'phases': times, 'total': sum(times.values()),
+                        'status': status, 'objective': objective}
+                    if history is not None:
+                        with open(history, 'a') as f:
+                            f.write(json.dumps(record) + '\n')
+                    print('{} size {} seed {}: {:.3f}s ({}) {}'.format(
+                        problem, size, seed, record['total'], status,
+                        ', '.join('{} {:.3f}s'.format(k, v) for k, v in times.items())))
+                    records.append(record)
+    return pd.json_normalize(records)
+
+
+def readHistory(history=HISTORY):
+    # runs of the history file, one column per phase (phases.load, ...)
+    with open(history) as f:
+        return pd.json_normalize([json.loads(line) for line in f if line.strip()])
+
+
+def compareHistory(history=HISTORY, base=None, head=None, threshold=1.2):
+    # median seconds of every phase by problem and size at two commits,
+    # the last two in the file by default; head over base ratios above
+    # threshold are marked as slower
+    df = readHistory(history)
+    commits = list(dict.fromkeys(df['commit']))
+    if head is None:
+        head = commits[-1]
+    if base is None:
+        earlier = [c for c in commits if c != head]
+        if not earlier:
+            print('no other commit in the history to compare {} with'.format(head))
+            return None
+        base = earlier[-1]
+
+    columns = [c for c in df.columns if c.startswith('phases.')] + ['total']
+    df = df[df['commit'].isin([base, head])]
+    df_median = df.groupby(['problem', 'size', 'commit'])[columns].median()
+    df_long = df_median.stack().rename('seconds').reset_index()
+    df_long = df_long.rename(columns={'level_3': 'phase'})
+    df_long['phase'] = df_long['phase'].str.replace('phases.', '', regex=False)
+    df_compare = df_long.pivot_table(index=['problem', 'size', 'phase'], columns='commit', values='seconds')
+    df_compare = df_compare.reindex(columns=[base, head]).dropna().reset_index()
+    df_compare['ratio'] = df_compare[head]/df_compare[base]
+    df_compare['slower'] = df_compare['ratio'] > threshold
+    print('{} -> {}'.format(base, head))
+    print(df_compare.to_string(index=False))
+    return df_compare
+
+
+if __name__ == '__main__':
+    # small sweep of every case, then the last two commits compared
+    runBenchmark(sizes={'problem1': [6, 8], 'problem1_2': [6, 8], 'problem2': [35, 70], 'problem3': [15, 100]})
+    compareHistory()
@@ -0,0 +1,288 @@
+# This script solves problem2 without a milp solver: it is a multiple
+# choice subset sum (at most one pipe per order, exactly CONTAINERS
+# containers, exact weight and volume), so weights and volumes are
+# scaled to integers. The (weight, volume) sums of every container come
+# from a dynamic program over its orders. Bitsets of the weight sums and
+# of the volume sums the containers before and after each one reach
+# with a given count prune the search: the last containers are expanded
+# into the exact set of (count, weight, volume) states that can still
+# meet the targets, and a depth first search over the first ones meets
+# it in the middle, remembering the states that failed. The search is
+# exhaustive, so no plan found proves there is none
+import time
+import numpy as np
+import pyomo.environ as pyo
+from problem2 import (Containers, readContainers, buildVars, solutionToPandas,
+    CONTAINERS, WEIGHT, VOLUME)
+
+
+def integerScale(values, digits=6):
+    # smallest power of ten making all values integers
+    values = np.asarray(values, dtype=float)
+    for k in range(digits + 1):
+        scaled = values*10**k
+        if np.all(np.abs(scaled - np.round(scaled)) <= 1e-6*np.maximum(1, np.abs(scaled))):
+            return 10**k
+    raise ValueError('values need more than {} decimals'.format(digits))
+
+
+def step(states, options, valid, span, cap=None, limit=None, chunk=1 << 22):
+    # every state plus every option, invalid ones dropped and equal ones
+    # merged; the parent state and option of every new state are kept.
+    # States and options are (count, weight, volume) arrays, span the
+    # weight and volume ranges of the keys, counts above cap are cut to
+    # it; the cross product is built in chunks of about chunk candidates
+    # and None is returned once more than limit of them are kept
+    size = max(1, chunk // max(1, len(options[0])))
+    parts = []
+    kept = 0
+    for lo in range(0, len(states[0]), size):
+        parent = np.repeat(np.arange(lo, min(lo + size, len(states[0]))), len(options[0]))
+        option = np.tile(np.arange(len(options[0])), len(parent) // len(options[0]))
+        new = [s[parent] + o[option] for s, o in zip(states, options)]
+        if cap is not None:
+            new[0] = np.minimum(new[0], cap)
+        mask = valid(*new)
+        new = [a[mask] for a in new + [parent, option]]
+        _, first = np.unique((new[0]*span[0] + new[1])*span[1] + new[2], return_index=True)
+        parts.append([a[first] for a in new])
+        kept += len(first)
+        if limit is not None and kept > limit:
+            return None
+    if not parts:
+        empty = np.zeros(0, dtype=np.int64)
+        return (empty,)*3, empty, empty
+    count, weight, volume, parent, option = [np.concatenate(a) for a in zip(*parts)]
+    _, first = np.unique((count*span[0] + weight)*span[1] + volume, return_index=True)
+    return (count[first], weight[first], volume[first]), parent[first], option[first]
+
+
+def containerOptions(orders, weight, volume, limit=None):
+    # reachable (weight, volume) sums of a used container, at most one
+    # pipe of every order and at least one in total; orders holds the
+    # scaled (weight, volume, pipe) arrays of every order. Returns the
+    # options and the layers to read their pipes back, None when there
+    # are more than limit sums
+    states = (np.zeros(1, dtype=np.int64),)*3
+    layers = []
+    for w, v, pipes in orders:
+        options = (np.r_[0, np.ones(len(w), dtype=np.int64)], np.r_[0, w], np.r_[0, v])
+        result = step(states, options,
+            lambda c, ww, vv: (ww <= weight) & (vv <= volume), (weight + 1, volume + 1), cap=1, limit=limit)
+        if result is None:
+            return None
+        states, parent, option = result
+        layers.append((parent, option, pipes))
+    used = np.flatnonzero(states[0] > 0)
+    return (states[1][used], states[2][used]), used, layers
+
+
+def readPipes(position, layers):
+    # pipes of the sub-state at position of the last order layer
+    pipes = []
+    for parent, option, list_pipe in reversed(layers):
+        if option[position] > 0:
+            pipes.append(list_pipe[option[position] - 1])
+        position = parent[position]
+    return pipes[::-1]
+
+
+def reachTables(list_sums, count, total):
+    # table[k][c]: bitset (bit s set when s is reachable) of the sums of
+    # exactly c of the containers k.. as little endian bytes; list_sums
+    # holds the distinct sums of every container, only counts that can
+    # still complete count containers are kept
+    n = len(list_sums)
+    mask = (1 << (total + 1)) - 1
+    bits = {0: 1}
+    table = [None]*(n + 1)
+    table[n] = {0: (1).to_bytes(total // 8 + 1, 'little')}
+    for k in range(n - 1, -1, -1):
+        new = {}
+        for c in range(max(0, count - k), min(count, n - k) + 1):
+            reach = bits.get(c, 0)
+            below = bits.get(c - 1, 0)
+            if below:
+                for s in list_sums[k]:
+                    reach |= below << s
+            new[c] = reach & mask
+        bits = new
+        table[k] = {c: b.to_bytes(total // 8 + 1, 'little') for c, b in bits.items()}
+    return table
+
+
+def hasBits(table, sums):
+    # bit of every sum in a bytes bitset, False outside of it
+    packed = np.frombuffer(table, dtype=np.uint8)
+    inside = (sums >= 0) & (sums < 8*len(packed))
+    index = np.where(inside, sums, 0)
+    return inside & ((packed[index >> 3] >> (index & 7)) & 1).astype(bool)
+
+
+def dpSolve(containers, count=CONTAINERS, weight=WEIGHT, volume=VOLUME,
+        maxStates=1 << 21, maxOptions=1 << 16):
+    # pipes of a plan meeting the targets, None when there is none; the
+    # last containers are expanded while their state set stays within
+    # maxStates. A container with more than maxOptions (weight, volume)
+    # sums raises ValueError, such instances are left to the milp
+    list_c = list(containers.dict_c.keys())
+    cop = list(containers.dict_cop.keys())
+    values = np.array([containers.dict_cop[k] for k in cop], dtype=float).reshape(-1, 2)
+    if (values < 0).any():
+        raise ValueError('weights and volumes must not be negative')
+    scaleW = max(integerScale(values[:, 0]), integerScale([weight]))
+    scaleV = max(integerScale(values[:, 1]), integerScale([volume]))
+    W, V = int(round(weight*scaleW)), int(round(volume*scaleV))
+    scaled = {k: (int(round(w*scaleW)), int(round(v*scaleV))) for k, (w, v) in zip(cop, values.tolist())}
+
+    # options of every container
+    list_option, list_sub = [], []
+    for c in list_c:
+        orders = []
+        for c1, o in dict.fromkeys(tuple(co) for co in containers.dict_c[c]):
+            pipes = [tuple(k) for k in containers.dict_co[c, o]]
+            orders.append((
+                np.array([scaled[k][0] for k in pipes], dtype=np.int64),
+                np.array([scaled[k][1] for k in pipes], dtype=np.int64), pipes))
+        result = containerOptions(orders, W, V, maxOptions)
+        if result is None:
+            raise ValueError('container {} has more than {} weight and volume sums'.format(c, maxOptions))
+        options, used, layers = result
+        list_option.append(options)
+        list_sub.append((used, layers))
+
+    # weight and volume sums reachable after (suffix) and before
+    # (prefix, from the reversed list) every container
+    n = len(list_c)
+    sumsW = [np.unique(o[0]).tolist() for o in list_option]
+    sumsV = [np.unique(o[1]).tolist() for o in list_option]
+    suffixW, suffixV = reachTables(sumsW, count, W), reachTables(sumsV, count, V)
+    prefixW, prefixV = reachTables(sumsW[::-1], count, W)[::-1], reachTables(sumsV[::-1], count, V)[::-1]
+
+    def reachable(table, c, s):
+        return c in table and 0 <= s and table[c][s >> 3] >> (s & 7) & 1
+
+    if not reachable(suffixW[0], count, W) or not reachable(suffixV[0], count, V):
+        return None
+
+    # exact states of the last containers, the prefix tables keep those
+    # the first containers can complete
+    states = (np.zeros(1, dtype=np.int64),)*3
+    tail = []
+    middle = n
+    while middle > 0:
+        k = middle - 1
+        options = (np.r_[0, np.ones(len(list_option[k][0]), dtype=np.int64)],
+            np.r_[0, list_option[k][0]], np.r_[0, list_option[k][1]])
+
+        def valid(c, w, v):
+            ok = (c <= count) & (w <= W) & (v <= V)
+            for rest in set((count - c[ok]).tolist()):
+                mask = ok & (c == count - rest)
+                if rest in prefixW[k]:
+                    ok[mask] = hasBits(prefixW[k][rest], W - w[mask]) & hasBits(prefixV[k][rest], V - v[mask])
+                else:
+                    ok[mask] = False
+            return ok
+        result = step(states, options, valid, (W + 1, V + 1), limit=2*maxStates)
+        if result is None or len(result[0][0]) > maxStates:
+            break
+        states, parent, option = result
+        tail.append((parent, option))
+        middle = k
+    tailKey = {key: i for i, key in enumerate(((states[0]*(W + 1) + states[1])*(V + 1) + states[2]).tolist())}
+
+    def candidates(k, c, w, v):
+        # options of container k (0 unused, i + 1 option i) keeping both
+        # targets reachable by the containers after it
+        result = []
+        rest = count - c
+        if reachable(suffixW[k + 1], rest, W - w) and reachable(suffixV[k + 1], rest, V - v):
+            result.append(0)
+        rest -= 1
+        if rest in suffixW[k + 1]:
+            tableW, tableV = suffixW[k + 1][rest], suffixV[k + 1][rest]
+            for i, (ow, ov) in enumerate(zip(*list_option[k])):
+                sw, sv = W - w - ow, V - v - ov
+                if sw >= 0 and sv >= 0 and tableW[sw >> 3] >> (sw & 7) & 1 and tableV[sv >> 3] >> (sv & 7) & 1:
+                    result.append(i + 1)
+        return result
+
+    def meets(c, w, v):
+        # position of the tail state completing the targets
+        return tailKey.get(((count - c)*(W + 1) + W - w)*(V + 1) + V - v)
+
+    # depth first search over the first containers, a frame is
+    # [k, c, w, v, candidates, next]
+    for k in range(n):
+        list_option[k] = tuple(o.tolist() for o in list_option[k])
+    failed = set()
+    frames = [[0, 0, 0, 0, candidates(0, 0, 0, 0) if middle > 0 else [], 0]]
+    position = meets(0, 0, 0) if middle == 0 else None
+    while frames and position is None:
+        frame = frames[-1]
+        k, c, w, v, cand, pos = frame
+        if pos == len(cand):
+            failed.add((k, c, w, v))
+            frames.pop()
+            continue
+        frame[5] += 1
+        choice = cand[pos]
+        if choice:
+            child = (k + 1, c + 1, w + list_option[k][0][choice - 1], v + list_option[k][1][choice - 1])
+        else:
+            child = (k + 1, c, w, v)
+        if child in failed:
+            continue
+        if child[0] == middle:
+            position = meets(*child[1:])
+            if position is None:
+                failed.add(child)
+            else:
+                frames.append(list(child) + [[], 0])
+            continue
+        frames.append(list(child) + [candidates(*child), 0])
+    if position is None:
+        return None
+
+    # pipes of the options on the path, then of the tail states
+    plan = []
+    for k, frame in enumerate(frames[:-1]):
+        choice = frame[4][frame[5] - 1]
+        if choice:
+            used, subLayers = list_sub[k]
+            plan += readPipes(used[choice - 1], subLayers)
+    for k, (parent, option) in zip(range(middle, n), tail[::-1]):
+        if option[position] > 0:
+            used, subLayers = list_sub[k]
+            plan += readPipes(used[option[position] - 1], subLayers)
+        position = parent[position]
+    return plan
+
+
+def loadPlan(model, plan):
+    # set the problem2 variables to the plan
+    chosen = set(plan)
+    for k, v in model.varPipes.items():
+        v.set_value(1 if k in chosen else 0)
+    used = {k[0] for k in plan}
+    for c, v in model.varContainers.items():
+        v.set_value(1 if c in used else 0)
+    return
+
+
+if __name__ == '__main__':
+    # read input excel and create containers object
+    df_containers = readContainers('data.xlsx')
+    containers = Containers(df_containers)
+
+    tic = time.perf_counter()
+    plan = dpSolve(containers)
+    print('dynamic programming in {:.2f}s'.format(time.perf_counter() - tic))
+    if plan is None:
+        print('no plan meets the targets')
+    else:
+        model = pyo.ConcreteModel()
+        buildVars(model, containers)
+        loadPlan(model, plan)
+        solutionToPandas(model, containers, 'problem2_output_dp.xlsx')
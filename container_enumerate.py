@@ -0,0 +1,155 @@
+# This script enumerates the feasible container plans of problem2: the
+# model stays in a persistent appsi solver and every plan found is cut
+# off by a no-good cut over varPipes handed to the solver on its own, so
+# the next plan is one incremental solve instead of a new lp file (glpk
+# has no persistent interface, highs is used). The search can be split
+# into disjoint parts by fixing varContainers values, every part is
+# enumerated in a worker process and plans are streamed as they arrive
+import os
+import time
+import itertools
+import multiprocessing
+import pandas as pd
+import pyomo.environ as pyo
+from concurrent.futures import ProcessPoolExecutor
+from pyomo.contrib.appsi.base import TerminationCondition
+from pyomo.contrib.appsi.solvers import Highs
+from problem2 import Containers, readContainers, buildVars, buildConstraints, addNoGood
+
+
+class PlanEnumerator():
+    # problem2 model in a persistent solver; fixed maps (component name,
+    # index) to the value the part of the search space fixes
+    def __init__(self, containers, fixed=None, solver=None, timeLimit=None):
+        self.opt = solver if solver is not None else Highs()
+        self.opt.config.load_solution = False
+        self.opt.config.time_limit = timeLimit
+        # the cuts are added to the solver one by one and nothing else
+        # changes, so the model is never scanned for changes
+        for option in self.opt.update_config.keys():
+            if option != 'treat_fixed_vars_as_params':
+                setattr(self.opt.update_config, option, False)
+
+        model = pyo.ConcreteModel()
+        self.model = model
+        buildVars(model, containers)
+        buildConstraints(model, containers)
+        for (name, index), value in (fixed or {}).items():
+            model.component(name)[index].fix(value)
+        self.free = any(not v.fixed for v in model.varPipes.values())
+        self.done = False
+        self.opt.set_instance(model)
+
+    def next(self):
+        # pipes of the next plan, None once there is none left (or the
+        # time limit ran out without one)
+        if self.done:
+            return None
+        results = self.opt.solve(self.model)
+        if results.termination_condition not in (
+                TerminationCondition.optimal, TerminationCondition.maxTimeLimit):
+            self.done = True
+            return None
+        try:
+            results.solution_loader.load_vars()
+        except RuntimeError:
+            self.done = True
+            return None
+
+        plan = [cop for cop, v in self.model.varPipes.items() if v.value > 0.5]
+        if self.free:
+            self.opt.add_constraints([addNoGood(self.model, plan)])
+        else:
+            self.done = True
+        return plan
+
+
+def splitContainers(containers, count):
+    # 2**count disjoint parts fixing the varContainers of the count
+    # containers with the most pipes to every combination of values
+    list_c = sorted(containers.dict_c, key=lambda c: len(containers.dict_c[c]), reverse=True)[:count]
+    return [{('varContainers', c): v for c, v in zip(list_c, values)}
+        for values in itertools.product((0, 1), repeat=len(list_c))]
+
+
+def _partWorker(containers, fixed, limit, timeLimit, queue, stop):
+    # plans of one part into the queue, None when the part is finished
+    try:
+        enumerator = PlanEnumerator(containers, fixed, timeLimit=timeLimit)
+        count = 0
+        while (limit is None or count < limit) and not stop.is_set():
+            plan = enumerator.next()
+            if plan is None:
+                break
+            queue.put(plan)
+            count += 1
+    finally:
+        queue.put(None)
+
+
+def enumeratePlans(containers, limit=None, parts=None, workers=None, timeLimit=None):
+    # generator of the feasible plans, at most limit of them; without
+    # parts the whole space is enumerated here, with parts every part
+    # goes to a worker and the plans are yielded in the order they are
+    # found, the workers stop once limit plans came in
+    if parts is None:
+        enumerator = PlanEnumerator(containers, timeLimit=timeLimit)
+        count = 0
+        while limit is None or count < limit:
+            plan = enumerator.next()
+            if plan is None:
+                return
+            yield plan
+            count += 1
+        return
+
+    workers = workers or os.cpu_count()
+    with multiprocessing.Manager() as manager:
+        queue, stop = manager.Queue(), manager.Event()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_partWorker, containers, fixed, limit, timeLimit, queue, stop)
+                for fixed in parts]
+            try:
+                finished, count = 0, 0
+                while finished < len(parts) and (limit is None or count < limit):
+                    plan = queue.get()
+                    if plan is None:
+                        finished += 1
+                        continue
+                    yield plan
+                    count += 1
+            finally:
+                stop.set()
+        for future in futures:
+            future.result()
+
+
+def streamPlans(plans, containers, file):
+    # append every plan to a csv file as it arrives, numbered from 0
+    if os.path.exists(file):
+        os.remove(file)
+    for k, plan in enumerate(plans):
+        c, o, p = zip(*plan) if plan else ((), (), ())
+        attributes = [containers.dict_cop[cop] for cop in plan]
+        df_plan = pd.DataFrame({
+            'plan': k, 'Container': c, 'Sales Order': o, 'Steel Pipe': p,
+            'weight': [a[0] for a in attributes], 'volume': [a[1] for a in attributes]})
+        df_plan.to_csv(file, mode='a', header=k == 0, index=False)
+        yield plan
+
+
+if __name__ == '__main__':
+    # read input excel and create containers object
+    df_containers = readContainers('data.xlsx')
+    containers = Containers(df_containers)
+
+    # first ten plans on the whole space
+    tic = time.perf_counter()
+    for k, plan in enumerate(streamPlans(enumeratePlans(containers, limit=10), containers, 'problem2_plans.csv')):
+        print('plan {}: {} pipes at {:.2f}s'.format(k, len(plan), time.perf_counter() - tic))
+
+    # every plan, the space split on two containers across the workers
+    tic = time.perf_counter()
+    plans = enumeratePlans(containers, parts=splitContainers(containers, 2))
+    for k, plan in enumerate(streamPlans(plans, containers, 'problem2_plans_split.csv')):
+        print('plan {}: {} pipes at {:.2f}s'.format(k, len(plan), time.perf_counter() - tic))
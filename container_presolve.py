@@ -0,0 +1,139 @@
+# This script shrinks the problem2 model before it is built: pipes of
+# an order with the same weight and volume are merged (an order ships at
+# most one pipe, so they are interchangeable), pipes that can't take
+# part in any plan reaching the weight and volume targets with exactly
+# CONTAINERS containers are dropped by bound propagation, and the
+# big-M of constrContainer becomes the number of orders of a container
+import time
+import numpy as np
+import pandas as pd
+import pyomo.environ as pyo
+from problem2 import (Containers, readContainers, indexCodes, buildVars, buildConstraints,
+    solutionToPandas, CONTAINERS, WEIGHT, VOLUME)
+from solver_config import SolverConfig
+
+
+def otherSums(values, alive, count, largest):
+    # for every container the sum of the count - 1 smallest (largest)
+    # values among the other alive containers
+    rank = np.argsort(np.where(alive, -values if largest else values, np.inf), kind='stable')
+    ordered = values[rank]
+    total, first = ordered[:count].sum(), ordered[:count - 1].sum()
+    position = np.empty(len(values), dtype=np.int64)
+    position[rank] = np.arange(len(values))
+    return np.where(position < count, total - values, first)
+
+
+def propagate(code_c, code_co, values, target, keep, count=CONTAINERS):
+    # pipes that keep the target within reach when chosen: the pipe, the
+    # best choices of the other orders of its container and the count - 1
+    # best other containers must be able to reach it from below and from
+    # above; a used container ships at least one pipe and at most one of
+    # every order
+    nc, nco = code_c.max() + 1, code_co.max() + 1
+    rows = np.flatnonzero(keep)
+    containerOf = np.zeros(nco, dtype=np.int64)
+    containerOf[code_co] = code_c
+    highOrder = np.full(nco, -np.inf)
+    np.maximum.at(highOrder, code_co[rows], values[rows])
+    lowOrder = np.full(nco, np.inf)
+    np.minimum.at(lowOrder, code_co[rows], values[rows])
+    used = np.isfinite(highOrder)
+    highOrder, lowOrder = np.where(used, highOrder, 0), np.where(used, lowOrder, 0)
+
+    # best sums of a used container: its positive (negative) order
+    # choices, or its single best pipe when there is none
+    sumHigh = np.bincount(containerOf, np.maximum(highOrder, 0), minlength=nc)
+    sumLow = np.bincount(containerOf, np.minimum(lowOrder, 0), minlength=nc)
+    pipeHigh = np.full(nc, -np.inf)
+    np.maximum.at(pipeHigh, code_c[rows], values[rows])
+    pipeLow = np.full(nc, np.inf)
+    np.minimum.at(pipeLow, code_c[rows], values[rows])
+    alive = np.isfinite(pipeLow)
+    if alive.sum() < count:
+        return np.zeros(len(keep), dtype=bool)
+    high = np.where(sumHigh > 0, sumHigh, np.where(alive, pipeHigh, 0))
+    low = np.where(sumLow < 0, sumLow, np.where(alive, pipeLow, 0))
+
+    tol = 1e-6*max(1.0, abs(target))
+    lowest = values + sumLow[code_c] - np.minimum(lowOrder, 0)[code_co] \
+        + otherSums(low, alive, count, largest=False)[code_c]
+    highest = values + sumHigh[code_c] - np.maximum(highOrder, 0)[code_co] \
+        + otherSums(high, alive, count, largest=True)[code_c]
+    return keep & (lowest <= target + tol) & (highest >= target - tol)
+
+
+def presolve(df_containers, count=CONTAINERS, weight=WEIGHT, volume=VOLUME):
+    # reduced containers object of the sheet: dict_c lists every order
+    # of a container once, bigM holds the number of orders, merged maps
+    # a kept pipe to the pipes it stands for, forced lists the
+    # containers every plan uses and targets the (count, weight, volume)
+    # the reduction assumed
+    code_c, code_co = indexCodes(df_containers)
+    w = df_containers['Steel Pipe weight (kg)'].to_numpy(dtype=float)
+    v = df_containers['Steel Pipe volume (m³)'].to_numpy(dtype=float)
+
+    # one pipe of every (order, weight, volume) class
+    group = pd.DataFrame({'co': code_co, 'w': w, 'v': v}).groupby(['co', 'w', 'v'], sort=False).ngroup().to_numpy()
+    _, first = np.unique(group, return_index=True)
+    keep = np.zeros(len(w), dtype=bool)
+    keep[first] = True
+    merged = len(w) - keep.sum()
+
+    # propagate both targets until no pipe is dropped
+    rounds = 0
+    while True:
+        rounds += 1
+        new = propagate(code_c, code_co, w, weight, keep, count)
+        new = propagate(code_c, code_co, v, volume, new, count)
+        if (new == keep).all():
+            break
+        keep = new
+
+    df_reduced = df_containers[keep]
+    reduced = Containers(df_reduced)
+    reduced.dict_c = {c: [list(co) for co in dict.fromkeys(tuple(co) for co in pairs)]
+        for c, pairs in reduced.dict_c.items()}
+    reduced.bigM = {c: len(pairs) for c, pairs in reduced.dict_c.items()}
+    reduced.forced = list(reduced.dict_c) if len(reduced.dict_c) == count else []
+    reduced.targets = (count, weight, volume)
+
+    reduced.merged = {}
+    columns = ['Container', 'Sales Order', 'Steel Pipe']
+    df_group = df_containers[columns].assign(group=group)
+    df_group = df_group[df_group['group'].isin(group[keep])]
+    for g, df in df_group.groupby('group', sort=False):
+        if len(df) > 1:
+            pipes = list(df.itertuples(index=False, name=None))
+            reduced.merged[pipes[0][:3]] = [cop[2] for cop in pipes]
+
+    print('presolve: {} -> {} containers, {} -> {} orders, {} -> {} pipes ({} merged, {} rounds)'.format(
+        code_c.max() + 1 if len(w) else 0, len(reduced.dict_c),
+        code_co.max() + 1 if len(w) else 0, len(reduced.dict_co),
+        len(w), len(df_reduced), merged, rounds))
+    return reduced
+
+
+def buildPresolved(model, reduced):
+    # problem2 model of the reduced containers at the targets of the
+    # presolve, the forced containers fixed to used
+    buildVars(model, reduced)
+    buildConstraints(model, reduced, reduced.bigM, targets=reduced.targets)
+    for c in reduced.forced:
+        model.varContainers[c].fix(1)
+    return
+
+
+if __name__ == '__main__':
+    # read input excel and presolve
+    df_containers = readContainers('data.xlsx')
+    tic = time.perf_counter()
+    reduced = presolve(df_containers)
+
+    model = pyo.ConcreteModel()
+    opt = SolverConfig('glpk').factory()
+    buildPresolved(model, reduced)
+    result = opt.solve(model, tee=True)
+    model.solutions.load_from(result)
+    print('presolved model in {:.2f}s'.format(time.perf_counter() - tic))
+    solutionToPandas(model, reduced, 'problem2_output_presolved.xlsx')
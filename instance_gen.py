@@ -0,0 +1,94 @@
+# This script generates seeded instances of the three cases at any
+# size: jobs with time windows of a chosen tightness for problem1 and
+# problem1_2, container manifests whose targets some hidden plan meets
+# exactly for problem2, and car lengths for problem3. The same seed
+# always gives the same instance, and the writers save them in the
+# format of the files the scripts read
+import numpy as np
+import pandas as pd
+from job_table import JobTable
+
+
+def generateJobs(n, tightness=0.5, seed=None):
+    # n jobs released over half of the total setup plus process time;
+    # a job's deadline is its earliest end plus a random slack of up to
+    # (1 - tightness) times that total over 4, so tightness 1 leaves no
+    # slack and 0 the loosest windows
+    rng = np.random.default_rng(seed)
+    process = rng.integers(1, 30, n)
+    setup = rng.integers(1, 10, n)
+    total = int(process.sum() + setup.sum())
+    release = rng.integers(0, max(1, total // 2), n)
+    slack = np.floor(rng.random(n)*(1 - tightness)*total/4).astype(np.int64)
+    deadline = release + setup + process + slack
+    job = np.array(['job_{}'.format(k + 1) for k in range(n)])
+    return JobTable(job, process, setup, release, deadline)
+
+
+def generateContainers(containers, orders=3, pipes=3, count=None, seed=None):
+    # manifest of containers with 1..orders sales orders of 1..pipes
+    # pipes each; count containers (half of them by default) are drawn
+    # with one pipe of a random non empty subset of their orders, the
+    # sums of that plan are the targets. Returns the sheet and the
+    # (containers, weight, volume) targets
+    rng = np.random.default_rng(seed)
+    count = containers // 2 if count is None else count
+    ordersOf = rng.integers(1, orders + 1, containers)
+    pipesOf = rng.integers(1, pipes + 1, ordersOf.sum())
+    rows = int(pipesOf.sum())
+    code_o = np.repeat(np.arange(len(pipesOf)), pipesOf)
+    code_c = np.repeat(np.repeat(np.arange(containers), ordersOf), pipesOf)
+    weight = rng.integers(10, 200, rows)
+    # volumes in hundredths of m³ so the target sums exactly
+    volume = rng.integers(100, 2000, rows)
+
+    # hidden plan: one pipe of some orders of count containers
+    chosen = np.zeros(containers, dtype=bool)
+    chosen[rng.choice(containers, count, replace=False)] = True
+    firstOrder = np.cumsum(ordersOf) - ordersOf
+    taken = rng.random(len(pipesOf)) < 0.5
+    taken[firstOrder + rng.integers(0, ordersOf)] = True
+    taken &= np.repeat(chosen, ordersOf)
+    firstPipe = np.cumsum(pipesOf) - pipesOf
+    plan = (firstPipe + np.floor(rng.random(len(pipesOf))*pipesOf).astype(np.int64))[taken]
+
+    df_containers = pd.DataFrame({
+        'Container': ['C{}'.format(c + 1) for c in code_c],
+        'Sales Order': ['SO{}'.format(o + 1) for o in code_o],
+        'Steel Pipe': ['P{}'.format(k + 1) for k in range(rows)],
+        'Steel Pipe weight (kg)': weight,
+        'Steel Pipe volume (m³)': volume/100})
+    return df_containers, (count, int(weight[plan].sum()), int(volume[plan].sum())/100)
+
+
+def generateCars(n, seed=None):
+    # n cars of 2.0 to 5.5 m, lengths to the decimetre as in df_cars
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'car': np.arange(1, n + 1), 'length': rng.integers(20, 56, n)/10})
+
+
+def writeJobs(dict_job, path):
+    # jobs csv as read by loadJobs
+    dict_job.toFrame().to_csv(path, sep=';', index=False)
+    return
+
+
+def writeContainers(df_containers, path):
+    # containers sheet as read by readContainers
+    df_containers.to_excel(path, index=False)
+    return
+
+
+def writeCars(df_cars, path):
+    # car lengths csv
+    df_cars.to_csv(path, index=False)
+    return
+
+
+if __name__ == '__main__':
+    # one instance of every case at its original size
+    dict_job = generateJobs(10, tightness=0.5, seed=0)
+    print(dict_job.toFrame())
+    df_containers, targets = generateContainers(70, seed=0)
+    print('{} pipes, targets: {} containers, weight {}, volume {}'.format(len(df_containers), *targets))
+    print(generateCars(15, seed=0))
@@ -0,0 +1,148 @@
+# This script records where the scripts spend their time as json lines:
+# wall and cpu seconds of every traced phase, the statistics of every
+# solve (status, objective, bound, gap, nodes, time) and the restarts
+# and improvements of the grasp. Tracing is off until enableTrace is
+# called or the CASE_TRACE environment variable names the file (worker
+# processes pick it up from there too); while it is off every call
+# returns right away
+import os
+import sys
+import json
+import math
+import time
+import functools
+
+_trace = None
+
+
+def enableTrace(path):
+    # append the records to path, one line each, written as they come
+    global _trace
+    disableTrace()
+    _trace = open(path, 'a', buffering=1)
+    return
+
+
+def disableTrace():
+    # stop recording and close the file
+    global _trace
+    if _trace is not None:
+        _trace.close()
+        _trace = None
+    return
+
+
+def tracing():
+    return _trace is not None
+
+
+def record(event, **fields):
+    # one json line with the event name, the time and the process
+    if _trace is None:
+        return
+    line = dict(event=event, time=time.time(), pid=os.getpid(), **fields)
+    _trace.write(json.dumps(line, default=str) + '\n')
+    return
+
+
+class Phase():
+    # context recording the wall and cpu seconds of a block
+    __slots__ = ['name', 'fields', 'wall', 'cpu']
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        record('phase', name=self.name,
+            wall=time.perf_counter() - self.wall, cpu=time.process_time() - self.cpu,
+            error=None if kind is None else kind.__name__, **self.fields)
+        return False
+
+
+class _Off():
+    # context doing nothing, shared while tracing is off
+    __slots__ = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        return False
+
+
+_OFF = _Off()
+
+
+def phase(name, **fields):
+    # context timing a block as phase name
+    return _OFF if _trace is None else Phase(name, fields)
+
+
+def traced(function):
+    # decorator timing every call of function as phase script.function
+    module = sys.modules.get(function.__module__)
+    script = os.path.splitext(os.path.basename(getattr(module, '__file__', None) or function.__module__))[0]
+    name = '{}.{}'.format(script, function.__qualname__)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwds):
+        if _trace is None:
+            return function(*args, **kwds)
+        with Phase(name, {}):
+            return function(*args, **kwds)
+    return wrapper
+
+
+def _number(value):
+    # float of a result field, None when it is undefined or not finite
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def solverStats(result):
+    # status, objective, bound, relative gap, nodes and solver seconds
+    # of a legacy pyomo result or an appsi one, None where the solver
+    # doesn't report a value
+    if hasattr(result, 'best_feasible_objective'):
+        status = str(result.termination_condition)
+        objective = _number(result.best_feasible_objective)
+        bound = _number(result.best_objective_bound)
+        nodes, seconds = None, _number(getattr(result, 'wallclock_time', None))
+    else:
+        status = str(result.solver.termination_condition)
+        problem = result.problem
+        maximize = 'max' in str(problem.sense)
+        lower, upper = _number(problem.lower_bound), _number(problem.upper_bound)
+        objective, bound = (lower, upper) if maximize else (upper, lower)
+        try:
+            nodes = _number(result.solver.statistics.branch_and_bound.number_of_bounded_subproblems)
+        except AttributeError:
+            nodes = None
+        seconds = None
+        for key in ('time', 'wallclock_time', 'user_time'):
+            seconds = seconds or _number(getattr(result.solver, key, None))
+    gap = None
+    if objective is not None and bound is not None:
+        gap = abs(objective - bound)/max(abs(objective), 1e-10)
+    return dict(status=status, objective=objective, bound=bound, gap=gap, nodes=nodes, seconds=seconds)
+
+
+def recordSolve(result, name='solve', **fields):
+    # solver statistics of a result as a solver event
+    if _trace is None:
+        return
+    record('solver', name=name, **solverStats(result), **fields)
+    return
+
+
+if os.environ.get('CASE_TRACE'):
+    enableTrace(os.environ['CASE_TRACE'])
@@ -0,0 +1,130 @@
+# This script loads the jobs of the scheduling problems as numpy
+# columns instead of one pandas backed Job per row: csv files are read
+# in chunks and a binary npz snapshot next to the file skips the parse
+# on the next load, until the file changes
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+from collections.abc import Mapping
+from instrument import traced
+
+COLUMNS = ['process_time', 'setup_time', 'release_time', 'deadline']
+
+
+class JobRecord():
+    # one job with the attributes of the Job classes, no per row dict
+    __slots__ = ['job'] + COLUMNS
+
+    def __init__(self, job, process_time, setup_time, release_time, deadline):
+        self.job = job
+        self.process_time = process_time
+        self.setup_time = setup_time
+        self.release_time = release_time
+        self.deadline = deadline
+
+
+class JobTable(Mapping):
+    # job columns indexed by job id, reads like the dict_job of Job
+    # objects the builders take; records are made on first access
+    def __init__(self, job, process_time, setup_time, release_time, deadline):
+        self.job = np.asarray(job, dtype=str)
+        self.process_time = np.asarray(process_time)
+        self.setup_time = np.asarray(setup_time)
+        self.release_time = np.asarray(release_time)
+        self.deadline = np.asarray(deadline)
+        self._index = None
+        self._records = {}
+
+    @classmethod
+    def fromFrame(cls, df_jobs):
+        # table of a jobs dataframe
+        return cls(df_jobs['job'].to_numpy(), *(df_jobs[c].to_numpy() for c in COLUMNS))
+
+    def index(self):
+        # row of every job id, built once
+        if self._index is None:
+            self._index = {j: k for k, j in enumerate(self.job.tolist())}
+            if len(self._index) != len(self.job):
+                raise ValueError('duplicate job ids')
+        return self._index
+
+    def __getitem__(self, j):
+        record = self._records.get(j)
+        if record is None:
+            k = self.index()[j]
+            record = JobRecord(j, *(getattr(self, c)[k].item() for c in COLUMNS))
+            self._records[j] = record
+        return record
+
+    def __iter__(self):
+        return iter(self.job.tolist())
+
+    def __len__(self):
+        return len(self.job)
+
+    def __contains__(self, j):
+        return j in self.index()
+
+    def head(self, n):
+        # table of the first n jobs
+        return JobTable(self.job[:n], *(getattr(self, c)[:n] for c in COLUMNS))
+
+    def toFrame(self):
+        # jobs dataframe as read from jobs.csv
+        return pd.DataFrame(dict(job=self.job, **{c: getattr(self, c) for c in COLUMNS}))
+
+
+def fileHash(path, block=1 << 20):
+    # sha1 of the file contents
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(block), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def readJobs(path, sep=';', chunksize=250000):
+    # parse the csv in chunks into one array per column
+    parts = {c: [] for c in ['job'] + COLUMNS}
+    for chunk in pd.read_csv(path, sep=sep, chunksize=chunksize, dtype={'job': str}):
+        for c in parts:
+            parts[c].append(chunk[c].to_numpy())
+    return JobTable(*(np.concatenate(parts[c]) if parts[c] else np.array([]) for c in parts))
+
+
+def saveSnapshot(snapshot, meta, columns):
+    # write the snapshot next to it and move it in place, so a reader
+    # never sees half a file
+    tmp = '{}.{}.tmp'.format(snapshot, os.getpid())
+    with open(tmp, 'wb') as f:
+        np.savez(f, meta=np.array(meta), **columns)
+    os.replace(tmp, snapshot)
+
+
+@traced
+def loadJobs(path, sep=';', chunksize=250000, cache=True):
+    # job table of a csv file through its path.npz snapshot: the
+    # snapshot is used while the file keeps its mtime and size, or its
+    # hash when those changed, and rebuilt otherwise
+    snapshot = path + '.npz'
+    stat = os.stat(path)
+    if cache and os.path.exists(snapshot):
+        try:
+            with np.load(snapshot, allow_pickle=False) as data:
+                columns = {c: data[c] for c in ['job'] + COLUMNS}
+                meta = data['meta'].tolist()
+            if meta[:2] == [str(stat.st_mtime_ns), str(stat.st_size)]:
+                return JobTable(**columns)
+            digest = fileHash(path)
+            if meta[2] == digest:
+                saveSnapshot(snapshot, [str(stat.st_mtime_ns), str(stat.st_size), digest], columns)
+                return JobTable(**columns)
+        except (OSError, KeyError, ValueError):
+            pass
+
+    table = readJobs(path, sep, chunksize)
+    if cache:
+        saveSnapshot(snapshot, [str(stat.st_mtime_ns), str(stat.st_size), fileHash(path)],
+            {c: getattr(table, c) for c in ['job'] + COLUMNS})
+    return table
@@ -0,0 +1,424 @@
+# This script builds the problem1, problem1_2 and problem2 models as
+# sparse arrays instead of pyomo rule callbacks: every constraint family
+# is a block of coo triplets made with numpy from the job or container
+# arrays, the matrix is compressed once and either written as a free mps
+# file (glpsol --freemps, or any other solver) or passed to highs in
+# process. Solved values come back as objects that read like the pyomo
+# variables, so the solutionToPandas functions take them unchanged
+import time
+import numpy as np
+import pandas as pd
+from collections import Counter
+from schedule_bounds import startBounds, ArcIndex
+from job_table import loadJobs
+
+INF = np.inf
+
+
+class VarValue():
+    # value of one variable, read as var.value
+    __slots__ = ['value']
+
+    def __init__(self, value):
+        self.value = value
+
+
+class MatrixVar():
+    # solved values of one variable component by index, iterated like an
+    # indexed pyomo variable (keys, values, items, [index], .value of a
+    # scalar one)
+    def __init__(self, index, values):
+        self.index = index
+        self.array = np.asarray(values, dtype=float)
+        self._position = None
+
+    def keys(self):
+        return list(self.index)
+
+    def values(self):
+        return [VarValue(v) for v in self.array.tolist()]
+
+    def items(self):
+        return zip(self.keys(), self.values())
+
+    def __getitem__(self, k):
+        if self._position is None:
+            self._position = {j: i for i, j in enumerate(self.index)}
+        return VarValue(self.array[self._position[k]].item())
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def value(self):
+        # value of a scalar variable
+        return self.array[0].item()
+
+
+class MatrixModel():
+    # milp as arrays: columns by variable component with bounds, cost and
+    # integrality, rows by constraint component as coo triplets with
+    # lower and upper bounds; the objective is minimized
+    def __init__(self, name='model'):
+        self.name = name
+        self.vars = {}
+        self.cons = {}
+        self.ncol = 0
+        self.nrow = 0
+        self.lower, self.upper, self.integer = [], [], []
+        self.cost = None
+        self.triplets = []
+        self.rowLower, self.rowUpper = [], []
+
+    def addVar(self, name, index, lower=0, upper=INF, integer=False):
+        # columns of a variable component, index None for a scalar one;
+        # returns their positions
+        index = [None] if index is None else list(index)
+        cols = np.arange(self.ncol, self.ncol + len(index))
+        self.vars[name] = (index, cols)
+        self.lower.append(np.full(len(index), lower, dtype=float))
+        self.upper.append(np.full(len(index), upper, dtype=float))
+        self.integer.append(np.full(len(index), integer, dtype=bool))
+        self.ncol += len(index)
+        return cols
+
+    def addRows(self, name, index, rows, cols, vals, lower=-INF, upper=INF):
+        # rows of a constraint component, rows numbering them from 0 in
+        # the order of index
+        index = list(index)
+        first = self.nrow
+        self.cons[name] = (index, np.arange(first, first + len(index)))
+        self.triplets.append((np.asarray(rows, dtype=np.int64) + first,
+            np.asarray(cols, dtype=np.int64), np.asarray(vals, dtype=float)))
+        self.rowLower.append(np.broadcast_to(np.asarray(lower, dtype=float), len(index)))
+        self.rowUpper.append(np.broadcast_to(np.asarray(upper, dtype=float), len(index)))
+        self.nrow += len(index)
+        return
+
+    def setObjective(self, cols, vals):
+        # cost of the given columns, every other column costs nothing
+        self.cost = np.zeros(self.ncol)
+        np.add.at(self.cost, np.asarray(cols, dtype=np.int64), vals)
+        return
+
+    def arrays(self):
+        # column bounds, integrality, cost and row bounds as flat arrays
+        cost = self.cost if self.cost is not None and len(self.cost) == self.ncol else np.zeros(self.ncol)
+        return (np.concatenate(self.lower), np.concatenate(self.upper), np.concatenate(self.integer),
+            cost, np.concatenate(self.rowLower), np.concatenate(self.rowUpper))
+
+    def compressed(self, byColumn=True):
+        # csc (or csr) arrays: start of every column (row), their row
+        # (column) positions and values, repeated entries summed
+        rows, cols, vals = [np.concatenate(a) for a in zip(*self.triplets)] if self.triplets else \
+            (np.zeros(0, dtype=np.int64),)*2 + (np.zeros(0),)
+        major, minor, size = (cols, rows, self.ncol) if byColumn else (rows, cols, self.nrow)
+        key, inverse = np.unique(major*max(self.nrow, self.ncol, 1) + minor, return_inverse=True)
+        value = np.bincount(inverse.ravel(), vals, minlength=len(key))
+        major, minor = key // max(self.nrow, self.ncol, 1), key % max(self.nrow, self.ncol, 1)
+        start = np.searchsorted(major, np.arange(size + 1))
+        return start, minor, value
+
+    def names(self):
+        # variable component and index of every column, as in the pyomo
+        # model, with the c<k> names of the mps file
+        return pd.DataFrame([('c{}'.format(k), name, i)
+            for name, (index, cols) in self.vars.items() for k, i in zip(cols.tolist(), index)],
+            columns=['column', 'var', 'index'])
+
+    def solution(self, x):
+        # values of every variable component of a column vector
+        values = {name: MatrixVar(index, np.asarray(x)[cols]) for name, (index, cols) in self.vars.items()}
+        return MatrixSolution(values)
+
+
+class MatrixSolution():
+    # solved variables as attributes (model.varSeq, model.varTime ...)
+    def __init__(self, values):
+        self.__dict__.update(values)
+
+
+def writeMps(matrix, file):
+    # free mps of the model, columns c<k> and rows r<k> in model order
+    # (MatrixModel.names maps the columns back), integer columns between
+    # markers with explicit bounds
+    lower, upper, integer, cost, rowLower, rowUpper = matrix.arrays()
+    start, row, value = matrix.compressed()
+    kind = np.where(rowLower == rowUpper, 'E', np.where(np.isinf(rowLower), 'L', 'G'))
+    kind = np.where(np.isinf(rowLower) & np.isinf(rowUpper), 'N', kind)
+    rhs = np.where(kind == 'L', rowUpper, rowLower)
+    ranged = ~np.isinf(rowLower) & ~np.isinf(rowUpper) & (rowLower != rowUpper)
+    lower, upper, integer, cost = lower.tolist(), upper.tolist(), integer.tolist(), cost.tolist()
+
+    with open(file, 'w') as f:
+        f.write('NAME {}\nROWS\n N obj\n'.format(matrix.name))
+        f.write(''.join(' {} r{}\n'.format(t, k) for k, t in enumerate(kind.tolist())))
+        f.write('COLUMNS\n')
+        marker = False
+        for k in range(matrix.ncol):
+            if integer[k] != marker:
+                marker = integer[k]
+                f.write(' M{} \'MARKER\' \'{}\'\n'.format(k, 'INTORG' if marker else 'INTEND'))
+            lines = [' c{} obj {!r}\n'.format(k, cost[k])] if cost[k] else []
+            lines += [' c{} r{} {!r}\n'.format(k, r, v)
+                for r, v in zip(row[start[k]:start[k + 1]].tolist(), value[start[k]:start[k + 1]].tolist())]
+            f.write(''.join(lines) if lines else ' c{} obj 0\n'.format(k))
+        if marker:
+            f.write(' M{} \'MARKER\' \'INTEND\'\n'.format(matrix.ncol))
+        f.write('RHS\n')
+        f.write(''.join(' rhs r{} {!r}\n'.format(k, v)
+            for k, v in zip(np.flatnonzero(rhs != 0).tolist(), rhs[rhs != 0].tolist()) if kind[k] != 'N'))
+        if ranged.any():
+            f.write('RANGES\n')
+            f.write(''.join(' rng r{} {!r}\n'.format(k, v)
+                for k, v in zip(np.flatnonzero(ranged).tolist(), (rowUpper - rowLower)[ranged].tolist())))
+        f.write('BOUNDS\n')
+        for k in range(matrix.ncol):
+            lo, up = lower[k], upper[k]
+            if integer[k] and lo == 0 and up == 1:
+                f.write(' BV bnd c{}\n'.format(k))
+            elif lo == up:
+                f.write(' FX bnd c{} {!r}\n'.format(k, lo))
+            else:
+                if lo == -INF:
+                    f.write(' MI bnd c{}\n'.format(k))
+                elif lo != 0:
+                    f.write(' LO bnd c{} {!r}\n'.format(k, lo))
+                if up != INF:
+                    f.write(' UP bnd c{} {!r}\n'.format(k, up))
+                elif integer[k]:
+                    f.write(' PL bnd c{}\n'.format(k))
+        f.write('ENDATA\n')
+    return
+
+
+def solveHighs(matrix, timeLimit=None, start=None, tee=False):
+    # solve the arrays with highs in process, start is an optional
+    # column vector tried as the first incumbent; returns the status
+    # text, the objective and the column values (None without any)
+    import highspy
+
+    lower, upper, integer, cost, rowLower, rowUpper = matrix.arrays()
+    colStart, row, value = matrix.compressed()
+    lp = highspy.HighsLp()
+    lp.num_col_, lp.num_row_ = matrix.ncol, matrix.nrow
+    lp.col_cost_, lp.col_lower_, lp.col_upper_ = cost, lower, upper
+    lp.row_lower_, lp.row_upper_ = rowLower, rowUpper
+    lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+    lp.a_matrix_.start_, lp.a_matrix_.index_, lp.a_matrix_.value_ = colStart, row, value
+    lp.integrality_ = [highspy.HighsVarType.kInteger if i else highspy.HighsVarType.kContinuous
+        for i in integer.tolist()]
+
+    h = highspy.Highs()
+    h.setOptionValue('output_flag', tee)
+    if timeLimit is not None:
+        h.setOptionValue('time_limit', float(timeLimit))
+    h.passModel(lp)
+    if start is not None:
+        solution = highspy.HighsSolution()
+        solution.col_value = list(map(float, start))
+        solution.value_valid = True
+        h.setSolution(solution)
+    h.run()
+    status = h.modelStatusToString(h.getModelStatus())
+    if h.getInfo().primal_solution_status != 2:
+        return status, None, None
+    return status, h.getInfo().objective_function_value, np.array(h.getSolution().col_value)
+
+
+def jobArrays(dict_job):
+    # job ids with '' last, their attributes ('' as zeros) and start
+    # bounds as arrays
+    list_job = list(dict_job.keys())
+    pos = {j: k for k, j in enumerate(list_job + [''])}
+    attr = {a: np.array([getattr(dict_job[j], a) for j in list_job] + [0], dtype=float)
+        for a in ['process_time', 'setup_time', 'release_time', 'deadline']}
+    earliest, latest = startBounds(dict_job)
+    attr['earliest'] = np.array([earliest[j] for j in list_job + ['']], dtype=float)
+    attr['latest'] = np.array([latest[j] for j in list_job + ['']], dtype=float)
+    return list_job, pos, attr
+
+
+def arcArrays(arcs, pos, n):
+    # arc ends as ids and the arcs into every job grouped by job: the
+    # arcs into job j are order[first[j]:first[j + 1]]
+    a1 = np.array([pos[j1] for j1, j2 in arcs], dtype=np.int64)
+    a2 = np.array([pos[j2] for j1, j2 in arcs], dtype=np.int64)
+    order = np.argsort(a2, kind='stable')
+    first = np.searchsorted(a2[order], np.arange(n + 2))
+    return a1, a2, order, first
+
+
+def seqRows(model, name, index, ids, a1, a2, seq, n, equal):
+    # constrSingle (arcs into every job sum to one) or constrNext (arcs
+    # out of every job sum to at most one) over the jobs with ids
+    end = a2 if equal else a1
+    row = np.full(n + 1, -1)
+    row[ids] = np.arange(len(ids))
+    keep = row[end] >= 0
+    model.addRows(name, index, row[end][keep], seq[keep], np.ones(keep.sum()),
+        1 if equal else -INF, 1)
+    return
+
+
+def matrixProblem1(dict_job, arcs=None, tightBigM=True):
+    # problem1 formulation of problem1.buildVars/buildConstraints/
+    # buildObjective as arrays
+    list_job, pos, attr = jobArrays(dict_job)
+    n = len(list_job)
+    arcs = (arcs if arcs is not None else ArcIndex(dict_job)).arcs
+    a1, a2, order, first = arcArrays(arcs, pos, n)
+    p, s, r, d = attr['process_time'], attr['setup_time'], attr['release_time'], attr['deadline']
+    isStart = a1 == n
+    A = len(arcs)
+
+    model = MatrixModel('problem1')
+    seq = model.addVar('varSeq', arcs, 0, 1, integer=True)
+    tim = model.addVar('varTime', arcs)
+    start = model.addVar('varStart', list_job + [''])
+    delay = model.addVar('varDelay', list_job + [''])
+    span = model.addVar('varMakeSpan', None)
+
+    seqRows(model, 'constrSingle', list_job, np.arange(n), a1, a2, seq, n, True)
+    out = np.unique(a1)
+    seqRows(model, 'constrNext', [(list_job + [''])[k] for k in out], out, a1, a2, seq, n, False)
+
+    # start of every job from the times of its incoming arcs
+    model.addRows('constrStart', list_job + [''],
+        np.r_[np.arange(n + 1), a2], np.r_[start, tim], np.r_[np.ones(n + 1), -np.ones(A)], 0, 0)
+
+    # arc time at most the latest start of j2 when the arc is used
+    bigM2 = attr['latest'][a2] if tightBigM else np.full(A, 9999.0)
+    model.addRows('constrBigM', arcs, np.r_[np.arange(A), np.arange(A)], np.r_[seq, tim],
+        np.r_[bigM2, -np.ones(A)], 0, INF)
+
+    # time sequence: start[j1] - time + M*seq <= M - p1 - s2
+    p1 = np.where(isStart, 0, p[a1])
+    bigM1 = (np.where(isStart, 0, attr['latest'][a1] + p[a1]) + s[a2]) if tightBigM else np.full(A, 9999.0)
+    model.addRows('constrTimeSeq', arcs, np.r_[np.arange(A), np.arange(A), np.arange(A)],
+        np.r_[start[a1], tim, seq], np.r_[np.ones(A), -np.ones(A), bigM1], -INF, bigM1 - p1 - s[a2])
+
+    model.addRows('constrDelay', arcs, np.r_[np.arange(A), np.arange(A)], np.r_[tim, seq],
+        np.r_[np.ones(A), -r[a2]], 0, INF)
+    model.addRows('constrDeadline', arcs, np.r_[np.arange(A), np.arange(A)], np.r_[tim, delay[a2]],
+        np.r_[np.ones(A), -np.ones(A)], -INF, d[a2])
+    model.addRows('constrMakeSpan', arcs, np.r_[np.arange(A), np.arange(A)], np.r_[tim, np.full(A, span[0])],
+        np.r_[np.ones(A), -np.ones(A)], -INF, -p[a2])
+
+    # 99 per unit of delay plus the makespan once per job
+    model.setObjective(np.r_[delay[:n], span], np.r_[np.full(n, 99.0), n])
+    return model
+
+
+def matrixProblem1_2(dict_job, arcs=None, tightBigM=True, objective='delay', maxDelay=None):
+    # problem1_2 formulation as arrays, objective 'delay' (obj1) or
+    # 'makespan' (obj2); maxDelay adds constrMaxDeadline as fixDelay does
+    list_job, pos, attr = jobArrays(dict_job)
+    n = len(list_job)
+    arcs = (arcs if arcs is not None else ArcIndex(dict_job)).arcs
+    a1, a2, order, first = arcArrays(arcs, pos, n)
+    p, s, r, d = attr['process_time'], attr['setup_time'], attr['release_time'], attr['deadline']
+    isStart = a1 == n
+    A = len(arcs)
+
+    model = MatrixModel('problem1_2')
+    seq = model.addVar('varSeq', arcs, 0, 1, integer=True)
+    tim = model.addVar('varTime', list_job + [''])
+    delay = model.addVar('varDelay', list_job + [''])
+    span = model.addVar('varMakeSpan', None)
+
+    seqRows(model, 'constrSingle', list_job, np.arange(n), a1, a2, seq, n, True)
+    out = np.unique(a1)
+    seqRows(model, 'constrNext', [(list_job + [''])[k] for k in out], out, a1, a2, seq, n, False)
+
+    # time sequence: time[j1] + p1*(arcs into j1) - time[j2] + M*seq <= M - s2
+    p1 = np.where(isStart, 0, p[a1])
+    bigM = np.maximum(attr['latest'][a1] + p1 + s[a2] - attr['earliest'][a2], 0) if tightBigM \
+        else np.full(A, 9999.0)
+    count = np.where(isStart, 0, first[a1 + 1] - first[a1])
+    rowIn = np.repeat(np.arange(A), count)
+    offset = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    colIn = seq[order[np.repeat(first[a1], count) + offset]]
+    model.addRows('constrTimeSeq', arcs,
+        np.r_[np.arange(A), np.arange(A), np.arange(A), rowIn],
+        np.r_[tim[a1], tim[a2], seq, colIn],
+        np.r_[np.ones(A), -np.ones(A), bigM, np.repeat(p1, count)], -INF, bigM - s[a2])
+
+    model.addRows('constrDelay', list_job, np.arange(n), tim[:n], np.ones(n), r[:n], INF)
+    model.addRows('constrDeadline', list_job, np.r_[np.arange(n), np.arange(n)], np.r_[tim[:n], delay[:n]],
+        np.r_[np.ones(n), -np.ones(n)], -INF, d[:n])
+
+    # makespan over every pair: time[j2] - time[j1] - span <= s1 - p2
+    j1 = np.repeat(np.arange(n + 1), n)
+    j2 = np.tile(np.arange(n), n + 1)
+    keep = j1 != j2
+    j1, j2 = j1[keep], j2[keep]
+    P = len(j1)
+    model.addRows('constrMakeSpan', [((list_job + [''])[a], list_job[b]) for a, b in zip(j1.tolist(), j2.tolist())],
+        np.r_[np.arange(P), np.arange(P), np.arange(P)], np.r_[tim[j2], tim[j1], np.full(P, span[0])],
+        np.r_[np.ones(P), -np.ones(P), -np.ones(P)], -INF, s[j1]*(j1 != n) - p[j2])
+
+    if maxDelay is not None:
+        model.addRows('constrMaxDeadline', [None], np.zeros(n), delay[:n], np.ones(n), -INF, maxDelay)
+    if objective == 'delay':
+        model.setObjective(delay[:n], np.ones(n))
+    else:
+        model.setObjective(span, [n])
+    return model
+
+
+def matrixProblem2(containers, bigM=None, count=None, weight=None, volume=None):
+    # problem2 formulation of problem2.buildVars/buildConstraints as
+    # arrays, a pipe counted in constrContainer as often as its order
+    # appears in dict_c; bigM maps containers to the big-M (100 without)
+    from problem2 import CONTAINERS, WEIGHT, VOLUME
+    count = CONTAINERS if count is None else count
+    weight = WEIGHT if weight is None else weight
+    volume = VOLUME if volume is None else volume
+
+    list_c, list_co, list_cop = list(containers.dict_c), list(containers.dict_co), list(containers.dict_cop)
+    posC = {c: k for k, c in enumerate(list_c)}
+    posCO = {co: k for k, co in enumerate(list_co)}
+    pipeC = np.array([posC[k[0]] for k in list_cop], dtype=np.int64)
+    pipeCO = np.array([posCO[k[:2]] for k in list_cop], dtype=np.int64)
+    times = Counter((c, o) for pairs in containers.dict_c.values() for c, o in pairs)
+    mult = np.array([times[co] for co in list_co], dtype=float)[pipeCO]
+    values = np.array([containers.dict_cop[k] for k in list_cop], dtype=float).reshape(-1, 2)
+    P, C = len(list_cop), len(list_c)
+
+    model = MatrixModel('problem2')
+    pipes = model.addVar('varPipes', list_cop, 0, 1, integer=True)
+    used = model.addVar('varContainers', list_c, 0, 1, integer=True)
+
+    M = np.full(C, 100.0) if bigM is None else np.array([bigM[c] for c in list_c], dtype=float)
+    model.addRows('constrContainer', list_c, np.r_[pipeC, np.arange(C)], np.r_[pipes, used],
+        np.r_[mult, -M], -INF, 0)
+    model.addRows('constrContainer2', list_c, np.r_[pipeC, np.arange(C)], np.r_[pipes, used],
+        np.r_[mult, -np.ones(C)], 0, INF)
+    model.addRows('constrOrder', list_co, pipeCO, pipes, np.ones(P), -INF, 1)
+    model.addRows('constrMaxContainer', [None], np.zeros(C), used, np.ones(C), count, count)
+    model.addRows('constrWeight', [None], np.zeros(P), pipes, values[:, 0], weight, weight)
+    model.addRows('constrVolume', [None], np.zeros(P), pipes, values[:, 1], volume, volume)
+    return model
+
+
+if __name__ == '__main__':
+    # read input csv and create jobs objects
+    from problem1_2 import solutionToPandas
+    dict_job = loadJobs('jobs.csv')
+
+    # delay, then makespan under that delay, straight from arrays
+    tic = time.perf_counter()
+    model = matrixProblem1_2(dict_job)
+    writeMps(model, 'problem1_2.mps')
+    print('arrays and mps in {:.2f}s: {} columns, {} rows'.format(
+        time.perf_counter() - tic, model.ncol, model.nrow))
+    status, totalDelay, x = solveHighs(model)
+    print('delay: {} ({})'.format(totalDelay, status))
+
+    model = matrixProblem1_2(dict_job, objective='makespan', maxDelay=totalDelay + 1e-6)
+    status, _, x = solveHighs(model, start=x)
+    solution = model.solution(x)
+    print('make span: {} ({})'.format(solution.varMakeSpan.value, status))
+    df_varTime, df_varDelay = solutionToPandas(solution, None)
+    print(df_varTime.sort_values('val'))
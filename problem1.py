@@ -1,6 +1,14 @@
-import pandas as pd
+import time
+import numpy as np
 import pyomo.environ as pyo
 from matplotlib import pyplot as plt
+from schedule_bounds import startBounds, listSchedule, ArcIndex
+from schedule_heuristic import heuristicSchedule
+from solution_io import varFrame, writeFrames
+from job_table import loadJobs
+from instrument import traced
+from solver_config import SolverConfig, solveWarm, availableSolvers
+from matrix_model import matrixProblem1, solveHighs
 
 class Job():
     # job class properties
@@ -12,59 +20,93 @@ class Job():
         self.deadline = row['deadline']
 
 
-def buildVars(model, dict_job):
+@traced
+def buildVars(model, dict_job, arcs=None):
     # function to create model sets and variables
+    # sequence variables only exist for the arcs of the arc index
     list_job = list(dict_job.keys())
+    if arcs is None:
+        arcs = ArcIndex(dict_job)
 
     # define sets
     model.setJobs = pyo.Set(initialize=list_job + [''])
-    model.setVars = pyo.Set(initialize=[
-        [j1, j2] for j1 in  list_job+[''] for j2 in list_job
-        if j1 != j2])
+    model.setVars = pyo.Set(initialize=arcs.arcs)
     
     # define variables
     model.varSeq = pyo.Var(model.setVars, domain=pyo.Binary)
     model.varTime = pyo.Var(model.setVars, domain=pyo.NonNegativeReals)
+    model.varStart = pyo.Var(model.setJobs, domain=pyo.NonNegativeReals)
     model.varDelay = pyo.Var(model.setJobs, domain=pyo.NonNegativeReals)
     # model.varSlack = pyo.Var(model.setJobs, domain=pyo.NonNegativeReals)
     model.varMakeSpan = pyo.Var(domain=pyo.NonNegativeReals)
     return
 
 
-def buildConstraints(model, dict_job):
+@traced
+def buildConstraints(model, dict_job, tightBigM=True):
     # function to create model constraints
-    list_job = list(dict_job.keys())
+    # tightBigM derives a big-M per arc from the job time windows,
+    # otherwise the fixed 9999 is used. Every arc row is a rule callback,
+    # about 2.5s for 200 jobs; matrix_model.matrixProblem1 builds the
+    # same rows as arrays for the instances where that matters
+    earliest, latest = startBounds(dict_job)
+
+    # incoming and outgoing arcs of every job
+    dict_in = {j: [] for j in model.setJobs}
+    dict_out = {j: [] for j in model.setJobs}
+    for j1, j2 in model.setVars:
+        dict_in[j2].append(j1)
+        dict_out[j1].append(j2)
+
+    def bigM(value):
+        return value if tightBigM else 9999
 
     # single start can be set for each job
     def constrSingle(model, job):
         if job == '':
             return pyo.Constraint.Feasible
         else:
-            return sum(model.varSeq[j, job] for j in list_job + [''] if j != job) == 1
+            return pyo.quicksum(model.varSeq[j, job] for j in dict_in[job]) == 1
     model.constrSingle = pyo.Constraint(model.setJobs, rule=constrSingle)
 
     # single following job
     def constrNext(model, job):
-        return sum(model.varSeq[job, j] for j in list_job if j != job) <= 1
+        if not dict_out[job]:
+            return pyo.Constraint.Skip
+        return pyo.quicksum(model.varSeq[job, j] for j in dict_out[job]) <= 1
     model.constrNext = pyo.Constraint(model.setJobs, rule=constrNext)
 
+    # start time of each job from its incoming arc times, built once
+    # and shared by every arc leaving the job
+    def constrStart(model, job):
+        return model.varStart[job] == pyo.quicksum(
+            model.varTime[j, job] for j in dict_in[job])
+    model.constrStart = pyo.Constraint(model.setJobs, rule=constrStart)
+
     # bigM decision and time
+    # the arc time is the start of j2, at most its latest start
     def constrBigM(model,j1,j2):
-        return model.varSeq[j1, j2]*9999 >= model.varTime[j1, j2]
+        return model.varSeq[j1, j2]*bigM(latest[j2]) >= model.varTime[j1, j2]
     model.constrBigM = pyo.Constraint(model.setVars, rule=constrBigM)
 
     # time sequence
+    # constrSingle makes the incoming sequence of a job sum to one, so
+    # its processing time enters as a constant; when the arc is unused
+    # its time is zero and the left side is at most the latest end of
+    # j1 plus the setup of j2
     def constrTimeSeq(model,j1,j2):
         return (
-            sum(model.varTime[j,j1] if j1 != '' else 0 for j in list_job + [''] if j != j1)
+            model.varStart[j1]
             +
-            sum(model.varSeq[j,j1]*dict_job[j1].process_time if j1 != '' else 0 for j in list_job + [''] if j != j1)
+            (dict_job[j1].process_time if j1 != '' else 0)
             +
             dict_job[j2].setup_time
             -
             model.varTime[j1,j2]
             <=
-            (1 - model.varSeq[j1,j2])*9999
+            (1 - model.varSeq[j1,j2])*bigM(
+                (latest[j1] + dict_job[j1].process_time if j1 != '' else 0)
+                + dict_job[j2].setup_time)
         )
     model.constrTimeSeq = pyo.Constraint(model.setVars, rule=constrTimeSeq)
 
@@ -85,6 +127,7 @@ def buildConstraints(model, dict_job):
 
 
 
+@traced
 def buildObjective(model, dict_job):
     # function to create model objectives
     # two objectives: reduce total deadline delay and unproductive time
@@ -94,55 +137,43 @@ def buildObjective(model, dict_job):
     return
 
 
-def solutionToPandas(model):
-    # decision variables dataframe
-    df_varSeq = pd.DataFrame()
+def loadStart(model, dict_job, order):
+    # load the list schedule of a job order as the mip start
+    start, _, end = listSchedule(dict_job, order)
     for v in model.varSeq:
-        if model.varSeq[v].value > 0.1:
-            df_varSeq = pd.concat([
-                df_varSeq,
-                    pd.DataFrame(
-                    [[v[0],
-                    v[1],
-                    model.varSeq[v].value]],
-                    columns = ['prev_job','cur_job','val']
-                )]
-            )
-
-    # start time dataframe
-    df_varTime = pd.DataFrame()
-    for v in model.varTime:
-        if (model.varTime[v].value is not None) & (model.varTime[v].value > 0.1):
-            df_varTime = pd.concat([
-                df_varTime,
-                    pd.DataFrame(
-                    [[v[0],
-                    v[1],
-                    model.varTime[v].value]],
-                    columns = ['prev_job','cur_job','val']
-                )]
-            )
-    
-    # delay time dataframe
-    df_varDelay = pd.DataFrame()
-    for v in model.varDelay:
-        if (model.varDelay[v].value is not None) and (model.varDelay[v].value > 0.1):
-            df_varDelay = pd.concat([
-                df_varDelay,
-                    pd.DataFrame(
-                    [[v,
-                    model.varDelay[v].value]],
-                    columns = ['cur_job','val']
-                )]
-            )
-    writer = pd.ExcelWriter('problem1_output.xlsx', engine='openpyxl')
-    df_varSeq.to_excel(writer, sheet_name="varSeq", index=False)
-    df_varTime.to_excel(writer, sheet_name="varTime", index=False)
-    df_varDelay.to_excel(writer, sheet_name="varDelay", index=False)
-    writer.close()
+        model.varSeq[v].value = 0
+        model.varTime[v].value = 0
+    for j1, j2 in zip([''] + order, order):
+        if (j1, j2) in model.setVars:
+            model.varSeq[j1, j2].value = 1
+            model.varTime[j1, j2].value = start[j2]
+    model.varStart[''].value = 0
+    model.varDelay[''].value = 0
+    for j in order:
+        model.varStart[j].value = start[j]
+        model.varDelay[j].value = max(start[j] - dict_job[j].deadline, 0)
+    model.varMakeSpan.value = end
+    return
+
+
+def addCutoff(model, cutoff):
+    # no schedule worse than a known one needs to be searched
+    model.constrCutoff = pyo.Constraint(expr=model.obj1.expr <= cutoff)
+    return
+
+
+@traced
+def solutionToPandas(model, file='problem1_output.xlsx'):
+    # create result dataframes and save them, the format follows the
+    # file extension (xlsx, csv, parquet, feather), None skips saving
+    df_varSeq = varFrame(model.varSeq, ['prev_job','cur_job'], threshold=0.1)
+    df_varTime = varFrame(model.varTime, ['prev_job','cur_job'], threshold=0.1)
+    df_varDelay = varFrame(model.varDelay, ['cur_job'], threshold=0.1)
+    writeFrames({'varSeq': df_varSeq, 'varTime': df_varTime, 'varDelay': df_varDelay}, file)
 
     return df_varTime, df_varDelay
 
+@traced
 def plotSolution(df_jobs, df_varTime):
     # plot results
     df_varTime = df_varTime.merge(df_jobs, how='left', left_on='cur_job', right_on='job')
@@ -165,20 +196,47 @@ def plotSolution(df_jobs, df_varTime):
 
 if __name__ == '__main__':
     # read input csv and create jobs objects
-    df_jobs = pd.read_csv('jobs.csv',sep=';')
-    df_jobs = df_jobs.head(8)
-    dict_job = {row['job']:Job(row) for idx, row in df_jobs.iterrows()}
-
-    model = pyo.ConcreteModel()
-
-    buildVars(model, dict_job)
-    buildConstraints(model, dict_job)
-    buildObjective(model, dict_job)
-
-    opt = pyo.SolverFactory('glpk')
-    result = opt.solve(model, tee=True)
-    # result.write()
-    model.solutions.load_from(result)
+    dict_job = loadJobs('jobs.csv').head(8)
+    df_jobs = dict_job.toFrame()
+
+    # heuristic schedule as incumbent, no job can be delayed by more
+    # than its objective over the delay weight, drop the arcs that force it
+    order, _, heurDelay, heurMakeSpan, (heurCost, _) = heuristicSchedule(dict_job)
+    print('heuristic delay: {}, make span: {}, objective: {}'.format(heurDelay, heurMakeSpan, heurCost))
+    arcs = ArcIndex(dict_job, maxDelay=heurCost/99)
+    print('arc index: {} arcs kept, {} removed'.format(len(arcs.arcs), arcs.removed))
+
+    if 'highs' in availableSolvers():
+        # the same model straight from arrays (200 jobs build in a few
+        # hundredths of a second against seconds of rule callbacks),
+        # solved by highs in process with the heuristic objective as cutoff
+        buildStart = time.perf_counter()
+        model = matrixProblem1(dict_job, arcs)
+        model.addRows('constrCutoff', [None], np.zeros(len(dict_job) + 1),
+            np.r_[model.vars['varDelay'][1][:len(dict_job)], model.vars['varMakeSpan'][1]],
+            np.r_[np.full(len(dict_job), 99.0), len(dict_job)], upper=heurCost)
+        buildTime = time.perf_counter() - buildStart
+        solveStart = time.perf_counter()
+        status, _, x = solveHighs(model, tee=True)
+        solveTime = time.perf_counter() - solveStart
+        model = model.solution(x)
+    else:
+        model = pyo.ConcreteModel()
+        buildStart = time.perf_counter()
+        buildVars(model, dict_job, arcs)
+        buildConstraints(model, dict_job)
+        buildObjective(model, dict_job)
+        loadStart(model, dict_job, order)
+        addCutoff(model, heurCost)
+        buildTime = time.perf_counter() - buildStart
+
+        opt = SolverConfig('glpk').factory()
+        solveStart = time.perf_counter()
+        result = solveWarm(opt, model, tee=True)
+        solveTime = time.perf_counter() - solveStart
+        # result.write()
+        model.solutions.load_from(result)
+    print('build time: {:.3f}s, solve time: {:.3f}s'.format(buildTime, solveTime))
 
     # compile output
     df_varTime, df_varDelay = solutionToPandas(model)
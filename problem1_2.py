@@ -1,6 +1,11 @@
-import pandas as pd
 import pyomo.environ as pyo
 from matplotlib import pyplot as plt
+from schedule_bounds import startBounds, listSchedule, ArcIndex
+from schedule_heuristic import heuristicSchedule
+from solution_io import varFrame, writeFrames
+from job_table import loadJobs
+from instrument import traced
+from solver_config import SolverConfig, solveWarm
 
 class Job():
     # job class properties
@@ -12,13 +17,18 @@ class Job():
         self.deadline = row['deadline']
 
 
-def buildVars(model, dict_job):
+@traced
+def buildVars(model, dict_job, arcs=None):
     # function to create model sets and variables
+    # sequence variables only exist for the arcs of the arc index
     list_job = list(dict_job.keys())
+    if arcs is None:
+        arcs = ArcIndex(dict_job)
 
     # define sets
     model.setJobs = pyo.Set(initialize=list_job + [''])
-    model.setVars = pyo.Set(initialize=[
+    model.setVars = pyo.Set(initialize=arcs.arcs)
+    model.setPairs = pyo.Set(initialize=[
         [j1, j2] for j1 in  list_job+[''] for j2 in list_job
         if j1 != j2])
     
@@ -31,35 +41,56 @@ def buildVars(model, dict_job):
     return
 
 
-def buildConstraints(model, dict_job):
+@traced
+def buildConstraints(model, dict_job, tightBigM=True):
     # function to create model constraints
-    list_job = list(dict_job.keys())
+    # tightBigM derives a big-M per arc from the job time windows,
+    # otherwise the fixed 9999 is used
+    earliest, latest = startBounds(dict_job)
+
+    # incoming and outgoing arcs of every job
+    dict_in = {j: [] for j in model.setJobs}
+    dict_out = {j: [] for j in model.setJobs}
+    for j1, j2 in model.setVars:
+        dict_in[j2].append(j1)
+        dict_out[j1].append(j2)
+
+    def bigM(value):
+        return value if tightBigM else 9999
 
     # single start can be set for each job
     def constrSingle(model, job):
         if job == '':
             return pyo.Constraint.Feasible
         else:
-            return sum(model.varSeq[j, job] for j in list_job + [''] if j != job) == 1
+            return sum(model.varSeq[j, job] for j in dict_in[job]) == 1
     model.constrSingle = pyo.Constraint(model.setJobs, rule=constrSingle)
 
     # single following job
     def constrNext(model, job):
-        return sum(model.varSeq[job, j] for j in list_job if j != job) <= 1
+        if not dict_out[job]:
+            return pyo.Constraint.Skip
+        return sum(model.varSeq[job, j] for j in dict_out[job]) <= 1
     model.constrNext = pyo.Constraint(model.setJobs, rule=constrNext)
 
     # time sequence
+    # when the arc is unused the left side is at most the latest end of
+    # j1 plus the setup of j2 minus the earliest start of j2
     def constrTimeSeq(model,j1,j2):
         return (
             model.varTime[j1]
             +
-            sum(model.varSeq[j,j1]*dict_job[j1].process_time if j1 != '' else 0 for j in list_job + [''] if j != j1)
+            sum(model.varSeq[j,j1]*dict_job[j1].process_time if j1 != '' else 0 for j in dict_in[j1])
             +
             dict_job[j2].setup_time
             -
             model.varTime[j2]
             <=
-            (1 - model.varSeq[j1,j2])*9999
+            (1 - model.varSeq[j1,j2])*bigM(max(
+                latest[j1]
+                + (dict_job[j1].process_time if j1 != '' else 0)
+                + dict_job[j2].setup_time
+                - earliest[j2], 0))
         )
     model.constrTimeSeq = pyo.Constraint(model.setVars, rule=constrTimeSeq)
 
@@ -77,7 +108,7 @@ def buildConstraints(model, dict_job):
         return model.varTime[job] <= model.varDelay[job] + dict_job[job].deadline
     model.constrDeadline = pyo.Constraint(model.setJobs, rule=constrDeadline)
 
-    # makespan
+    # makespan, over every pair of jobs rather than the arcs
     def constrMakeSpan(model,j1,j2):
         return (
             model.varTime[j2]
@@ -89,9 +120,10 @@ def buildConstraints(model, dict_job):
             (dict_job[j1].setup_time if j1 != '' else 0)
             <= 
             model.varMakeSpan)
-    model.constrMakeSpan = pyo.Constraint(model.setVars, rule=constrMakeSpan)
+    model.constrMakeSpan = pyo.Constraint(model.setPairs, rule=constrMakeSpan)
 
 
+@traced
 def buildObjective(model, dict_job):
     # function to create model objectives
     # reduce total deadline delay
@@ -107,16 +139,18 @@ def buildObjective(model, dict_job):
     return
 
 
-def fixDelay(model, dict_job):
+def fixDelay(model, dict_job, totalDelay=None):
     # adjust for minimizin makespan
+    # totalDelay bounds the delay, by default the one of the solution
     model.obj1.deactivate()
     model.obj2.activate()
 
     # calculate total delay
-    totalDelay = 0
-    for v in model.varDelay:
-        if model.varDelay[v].value is not None and model.varDelay[v].value > 0.5:
-            totalDelay += model.varDelay[v].value
+    if totalDelay is None:
+        totalDelay = 0
+        for v in model.varDelay:
+            if model.varDelay[v].value is not None and model.varDelay[v].value > 0.5:
+                totalDelay += model.varDelay[v].value
 
     # constrain the maximum delay
     def constrMaxDeadline(model):
@@ -126,55 +160,42 @@ def fixDelay(model, dict_job):
     return totalDelay
 
 
-def solutionToPandas(model):
-    # create result dataframes and save in xlsx file
-    # decision variables dataframe
-    df_varSeq = pd.DataFrame()
+def loadStart(model, dict_job, order):
+    # load the list schedule of a job order as the mip start, the dummy
+    # start sits right before the setup of the first job
+    start, _, end = listSchedule(dict_job, order)
     for v in model.varSeq:
-        if model.varSeq[v].value > 0.1:
-            df_varSeq = pd.concat([
-                df_varSeq,
-                    pd.DataFrame(
-                    [[v[0],
-                    v[1],
-                    model.varSeq[v].value]],
-                    columns = ['prev_job','cur_job','val']
-                )]
-            )
-
-    # start time dataframe
-    df_varTime = pd.DataFrame()
-    for v in model.varTime:
-        if (model.varTime[v].value is not None) & (model.varTime[v].value > 0.1):
-            df_varTime = pd.concat([
-                df_varTime,
-                    pd.DataFrame(
-                    [[v,
-                    model.varTime[v].value]],
-                    columns = ['cur_job','val']
-                )]
-            )
-    
-    # delay time dataframe
-    df_varDelay = pd.DataFrame()
-    for v in model.varDelay:
-        if (model.varDelay[v].value is not None) and (model.varDelay[v].value > 0.1):
-            df_varDelay = pd.concat([
-                df_varDelay,
-                    pd.DataFrame(
-                    [[v,
-                    model.varDelay[v].value]],
-                    columns = ['cur_job','val']
-                )]
-            )
-    writer = pd.ExcelWriter('problem1_output.xlsx', engine='openpyxl')
-    df_varSeq.to_excel(writer, sheet_name="varSeq", index=False)
-    df_varTime.to_excel(writer, sheet_name="varTime", index=False)
-    df_varDelay.to_excel(writer, sheet_name="varDelay", index=False)
-    writer.close()
+        model.varSeq[v].value = 0
+    for j1, j2 in zip([''] + order, order):
+        if (j1, j2) in model.setVars:
+            model.varSeq[j1, j2].value = 1
+    model.varTime[''].value = start[order[0]] - dict_job[order[0]].setup_time
+    model.varDelay[''].value = 0
+    for j in order:
+        model.varTime[j].value = start[j]
+        model.varDelay[j].value = max(start[j] - dict_job[j].deadline, 0)
+    model.varMakeSpan.value = end - model.varTime[''].value
+    return
+
+
+def addCutoff(model, cutoff):
+    # no schedule delayed more than a known one needs to be searched
+    model.constrCutoff = pyo.Constraint(expr=model.obj1.expr <= cutoff)
+    return
+
+
+@traced
+def solutionToPandas(model, file='problem1_output.xlsx'):
+    # create result dataframes and save them, the format follows the
+    # file extension (xlsx, csv, parquet, feather), None skips saving
+    df_varSeq = varFrame(model.varSeq, ['prev_job','cur_job'], threshold=0.1)
+    df_varTime = varFrame(model.varTime, ['cur_job'], threshold=0.1)
+    df_varDelay = varFrame(model.varDelay, ['cur_job'], threshold=0.1)
+    writeFrames({'varSeq': df_varSeq, 'varTime': df_varTime, 'varDelay': df_varDelay}, file)
 
     return df_varTime, df_varDelay
 
+@traced
 def plotSolution(df_jobs, df_varTime):
     # plot results
     df_varTime = df_varTime.merge(df_jobs, how='left', left_on='cur_job', right_on='job')
@@ -197,27 +218,36 @@ def plotSolution(df_jobs, df_varTime):
 
 if __name__ == '__main__':
     # read input csv and create jobs objects
-    df_jobs = pd.read_csv('jobs.csv',sep=';')
-    dict_job = {row['job']:Job(row) for idx, row in df_jobs.iterrows()}
+    dict_job = loadJobs('jobs.csv')
+    df_jobs = dict_job.toFrame()
+
+    # heuristic schedule as incumbent, any job delayed by more than its
+    # total delay can't be optimal, drop the arcs that force it
+    order, _, heurDelay, heurMakeSpan, _ = heuristicSchedule(dict_job, lexicographic=True)
+    print('heuristic delay: {}, make span: {}'.format(heurDelay, heurMakeSpan))
+    arcs = ArcIndex(dict_job, maxDelay=heurDelay)
+    print('arc index: {} arcs kept, {} removed'.format(len(arcs.arcs), arcs.removed))
 
     model = pyo.ConcreteModel()
-    opt = pyo.SolverFactory('glpk')
+    opt = SolverConfig('glpk').factory()
 
-    buildVars(model, dict_job)
+    buildVars(model, dict_job, arcs)
     buildConstraints(model, dict_job)
     buildObjective(model, dict_job)
+    loadStart(model, dict_job, order)
+    addCutoff(model, heurDelay)
 
     ## SOLVE DELAY MINIMIZATION
     # deactivate makespan objective
     model.obj2.deactivate()
-    result = opt.solve(model, tee=True)
+    result = solveWarm(opt, model, tee=True)
     model.solutions.load_from(result)
 
     ## SOLVE MAKESPAN MINIMIZATION
     # fix max delay value and deactivate objective
     # activate makespan constraint
     totalDelay = fixDelay(model, dict_job)
-    result = opt.solve(model, tee=True)
+    result = solveWarm(opt, model, tee=True)
     model.solutions.load_from(result)
 
     # compile output
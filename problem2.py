@@ -1,31 +1,96 @@
 # This script formulates and solves a container shipping problem
+import os
+import numpy as np
 import pandas as pd
 import pyomo.environ as pyo
 from matplotlib import pyplot as plt
+from job_table import fileHash
+from solution_io import varFrame, writeFrames
+from instrument import traced, phase, recordSolve
+from solver_config import SolverConfig
+
+# targets of the shipment: containers used, total weight and volume
+CONTAINERS = 35
+WEIGHT = 18844
+VOLUME = 5163.69
 
 class Containers():
     def __init__(self, df_containers):
         # create dictionaries for easy index access
+        # one factorize per index level gives compact codes in order of
+        # first appearance, a stable sort by code groups the rows; the
+        # dictionaries keep the row order of the sheet, dict_c holds one
+        # [c,o] per pipe as the constraints expect
+        c = df_containers['Container'].to_numpy()
+        o = df_containers['Sales Order'].to_numpy()
+        p = df_containers['Steel Pipe'].to_numpy()
+        self.weight = df_containers['Steel Pipe weight (kg)'].to_numpy(dtype=float)
+        self.volume = df_containers['Steel Pipe volume (m³)'].to_numpy(dtype=float)
+        self.code_c, self.code_co = indexCodes(df_containers)
+
+        list_c, list_o, list_p = c.tolist(), o.tolist(), p.tolist()
         self.dict_c = {}
+        for group in groupRows(self.code_c):
+            self.dict_c[list_c[group[0]]] = [[list_c[k], list_o[k]] for k in group]
         self.dict_co = {}
-        self.dict_cop = {}
-        for idx, row in df_containers.iterrows():
-            c = row['Container']
-            o = row['Sales Order']
-            p = row['Steel Pipe']
-            weight = row['Steel Pipe weight (kg)']
-            volume = row['Steel Pipe volume (m³)']
-            if c not in self.dict_c:
-                self.dict_c[c] = [[c,o]]
-            else:
-                self.dict_c[c] = self.dict_c[c] + [[c,o]]
-            if (c,o) not in self.dict_co:
-                self.dict_co[c,o] = [[c,o,p]]
-            else:
-                self.dict_co[c,o] = self.dict_co[c,o] + [[c,o,p]]
-            self.dict_cop[c,o,p] = [weight, volume]
+        for group in groupRows(self.code_co):
+            self.dict_co[list_c[group[0]], list_o[group[0]]] = [[list_c[k], list_o[k], list_p[k]] for k in group]
+        self.dict_cop = dict(zip(
+            zip(list_c, list_o, list_p),
+            ([w, v] for w, v in zip(self.weight.tolist(), self.volume.tolist()))))
+
+
+def indexCodes(df_containers):
+    # container and (container, order) codes of every row, numbered in
+    # order of first appearance
+    code_c, _ = pd.factorize(df_containers['Container'])
+    code_o, uniques_o = pd.factorize(df_containers['Sales Order'])
+    code_co, _ = pd.factorize(code_c.astype(np.int64)*len(uniques_o) + code_o)
+    return code_c, code_co
+
+
+def groupRows(codes):
+    # row positions of every code, codes in increasing order and rows in
+    # sheet order
+    order = np.argsort(codes, kind='stable')
+    bounds = np.flatnonzero(np.diff(codes[order])) + 1
+    return [group.tolist() for group in np.split(order, bounds)] if len(codes) else []
+
+
+@traced
+def readContainers(path='data.xlsx', cache=True):
+    # parsed sheet through a path.pkl snapshot, used while the file
+    # keeps its mtime and size, or its hash when those changed, and
+    # parsed again otherwise
+    snapshot = path + '.pkl'
+    stat = os.stat(path)
+    meta = [stat.st_mtime_ns, stat.st_size]
+    if cache and os.path.exists(snapshot):
+        try:
+            saved = pd.read_pickle(snapshot)
+            if saved['meta'][:2] == meta:
+                return saved['df']
+            digest = fileHash(path)
+            if saved['meta'][2] == digest:
+                saveSheet(snapshot, meta + [digest], saved['df'])
+                return saved['df']
+        except (OSError, KeyError, ValueError, EOFError):
+            pass
+
+    df_containers = pd.read_excel(path)
+    if cache:
+        saveSheet(snapshot, meta + [fileHash(path)], df_containers)
+    return df_containers
+
+
+def saveSheet(snapshot, meta, df_containers):
+    # write the snapshot next to it and move it in place
+    tmp = '{}.{}.tmp'.format(snapshot, os.getpid())
+    pd.to_pickle({'meta': meta, 'df': df_containers}, tmp)
+    os.replace(tmp, snapshot)
 
     
+@traced
 def buildVars(model, containers):
     # define sets
     model.set_c = pyo.Set(initialize=containers.dict_c.keys())
@@ -38,14 +103,19 @@ def buildVars(model, containers):
     return
 
 
-def buildConstraints(model, containers):
+@traced
+def buildConstraints(model, containers, bigM=None, targets=None):
     # function to create model constraints
+    # bigM maps containers to the big-M of constrContainer, 100 for all
+    # without it; targets is a (containers, weight, volume) tuple, the
+    # CONTAINERS, WEIGHT and VOLUME of the shipment without it
+    count, weight, volume = (CONTAINERS, WEIGHT, VOLUME) if targets is None else targets
 
     # containers to product relationship
     def constrContainer(model, c):
         return sum(
             model.varPipes[c,o,p] for c1,o in containers.dict_c[c] for c2,o,p in containers.dict_co[c,o]
-            ) <= model.varContainers[c] * 100
+            ) <= model.varContainers[c] * (100 if bigM is None else bigM[c])
     model.constrContainer = pyo.Constraint(model.set_c, rule=constrContainer)
 
     def constrContainer2(model, c):
@@ -65,81 +135,86 @@ def buildConstraints(model, containers):
     def constrMaxContainer(model):
         return sum(
             model.varContainers[c] for c in model.set_c
-            ) == 35
+            ) == count
     model.constrMaxContainer = pyo.Constraint(rule=constrMaxContainer)
 
     # weight constraint
     def constrWeight(model):
         return sum(
             model.varPipes[c,o,p]*containers.dict_cop[c,o,p][0] for c,o,p in model.set_cop
-            ) == 18844
+            ) == weight
     model.constrWeight = pyo.Constraint(rule=constrWeight)
 
     # volume constraint
     def constrVolume(model):
         return sum(
             model.varPipes[c,o,p]*containers.dict_cop[c,o,p][1] for c,o,p in model.set_cop
-            ) == 5163.69
+            ) == volume
     model.constrVolume = pyo.Constraint(rule=constrVolume)
 
     return
 
 
-def removeSolution(model,containers):
-    # add a new constraint to remove the original possibility
-    totalPipes = 0
-    for c,o,p in model.set_cop:
-        if model.varPipes[c,o,p].value is not None and model.varPipes[c,o,p].value > 0.5:
-            totalPipes += model.varPipes[c,o,p].value
+def addNoGood(model, plan):
+    # binary no-good cut: every plan but the one choosing exactly the
+    # pipes of plan stays feasible; fixed pipes are the same in every
+    # plan left and stay out of the cut
+    chosen = set(plan)
+    cut = pyo.quicksum(
+        1 - model.varPipes[cop] if cop in chosen else model.varPipes[cop]
+        for cop in model.set_cop if not model.varPipes[cop].fixed)
+    if not hasattr(model, 'constrNoGood'):
+        model.constrNoGood = pyo.ConstraintList()
+    return model.constrNoGood.add(cut >= 1)
 
-    def constrOriginal(model):
-        return sum(
-            model.varPipes[c,o,p] for c,o,p in model.set_cop
-            if model.varPipes[c,o,p].value > 0.5
-            ) <= totalPipes - 0.5
-    model.constrOriginal = pyo.Constraint(rule=constrOriginal)
 
-    return
+def removeSolution(model,containers):
+    # add a new constraint to remove the original possibility
+    plan = [cop for cop in model.set_cop
+        if model.varPipes[cop].value is not None and model.varPipes[cop].value > 0.5]
+    return addNoGood(model, plan)
 
+@traced
 def solutionToPandas(model,containers,file):
-    # create result dataframes and save in xlsx file
+    # create result dataframe and save it, the format follows the file
+    # extension (xlsx, csv, parquet, feather), None skips saving
     # decision variables dataframe
-    df_varPipes = pd.DataFrame()
-
-    for v in model.varPipes:
-        if model.varPipes[v].value > 0.5:
-            df_varPipes = pd.concat([df_varPipes,
-                pd.DataFrame(
-                    [[v[0],v[1],v[2],model.varPipes[v].value,
-                        containers.dict_cop[v[0],v[1],v[2]][0],
-                        containers.dict_cop[v[0],v[1],v[2]][1]]],
-                    columns = ['Container','Sales Order','Steel Pipe','val','weight','volume'])
-            ])
+    df_varPipes = varFrame(model.varPipes, ['Container','Sales Order','Steel Pipe'], threshold=0.5)
+    attributes = [containers.dict_cop[v] for v in zip(
+        df_varPipes['Container'].tolist(),
+        df_varPipes['Sales Order'].tolist(),
+        df_varPipes['Steel Pipe'].tolist())]
+    df_varPipes[['weight','volume']] = np.array(attributes, dtype=float).reshape(-1, 2)
 
-    df_varPipes.to_excel(file, index=False)
+    writeFrames({'varPipes': df_varPipes}, file)
 
     return df_varPipes
 
 if __name__ == '__main__':
     # read input csv and create jobs objects
-    df_containers = pd.read_excel('data.xlsx')
-    containers = Containers(df_containers)
+    df_containers = readContainers('data.xlsx')
+    with phase('problem2.Containers'):
+        containers = Containers(df_containers)
 
     model = pyo.ConcreteModel()
-    opt = pyo.SolverFactory('glpk')
+    opt = SolverConfig('glpk').factory()
 
     buildVars(model, containers)
     buildConstraints(model, containers)
 
     # solve initial problem
-    result = opt.solve(model, tee=True)
+    with phase('problem2.solve'):
+        result = opt.solve(model, tee=True)
+    recordSolve(result)
     model.solutions.load_from(result)
     solutionToPandas(model,containers,'problem2_output_a.xlsx')
 
     # check if there is another solution
     removeSolution(model,containers)
     
-    result = opt.solve(model, tee=True)
+    with phase('problem2.solve'):
+        result = opt.solve(model, tee=True)
+    recordSolve(result)
     model.solutions.load_from(result)
     solutionToPandas(model,containers,'problem2_output_b.xlsx')
 
@@ -1,11 +1,21 @@
 # This script runs GRASP metaheuristics for the parking case.
-# The script is not optimized for performance and speed, but
-# it is easier to explain a demonstrate the concept.
+# The solution is kept in compact numpy arrays (car lengths, the side
+# of every car and the running length of each side) so construction
+# and local search update the state in place instead of copying and
+# filtering dataframes on every move. Sides generalise to k lanes
+# labelled A, B, C, ...
 
 import pandas as pd
-import copy
-import random
+import numpy as np
+import os
+import math
+import time
+import heapq
+import multiprocessing
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
 from matplotlib import pyplot as plt
+from instrument import traced, record
 
 # car lengths
 df_cars = pd.DataFrame(
@@ -13,132 +23,691 @@ df_cars = pd.DataFrame(
         [8,3.5],[9,3.2],[10,4.5],[11,2.3],[12,3.3],[13,3.8],[14,4.6],[15,3]],
         columns=['car','length'])
 
+# tolerance for float improvements
+EPS = 1e-9
+
+# seconds of restarts a worker process has to take over to pay for its
+# start (a fork is a few hundredths, a spawn reimports the modules)
+POOL_SECONDS = 0.25
+
+
+class CarSides():
+    # array state of a parking split: car lengths, side index of each
+    # car (-1 while unassigned), running length of every side and, per
+    # side, a Fenwick tree counting its cars by length rank so a move
+    # updates in O(log n) and the k-th shortest car of a side or the
+    # number of its cars below a length is found in O(log n)
+    def __init__(self, length, lanes=2):
+        self.lanes = lanes
+        self.length = np.asarray(length, dtype=np.float64)
+        self.order = np.argsort(self.length, kind='stable')
+        self.rank = np.empty(len(self.length), dtype=np.int64)
+        self.rank[self.order] = np.arange(len(self.length))
+        self.sortedLength = self.length[self.order].tolist()
+        self.side = np.full(len(self.length), -1, dtype=np.int16)
+        self.lenSide = [0.0] * lanes
+        self.count = [0] * lanes
+        self.tree = [[0] * (len(self.length) + 1) for s in range(lanes)]
+
+    def load(self, side):
+        # take over a full side assignment and recompute the totals, node
+        # i of a tree holds the cars of ranks (i - lowbit(i), i]
+        self.side[:] = side
+        node = np.arange(1, len(self.length) + 1)
+        for s in range(self.lanes):
+            cum = np.concatenate(([0], np.cumsum(self.side[self.order] == s)))
+            self.tree[s] = [0] + (cum[node] - cum[node & (node - 1)]).tolist()
+            self.count[s] = int(cum[-1])
+        self.lenSide = [math.fsum(self.length[self.side == s]) for s in range(self.lanes)]
+
+    def _add(self, s, r, d):
+        # add d cars of rank r to the tree of side s
+        tree = self.tree[s]
+        i = r + 1
+        while i < len(tree):
+            tree[i] += d
+            i += i & -i
+
+    def below(self, s, x, side='left'):
+        # number of side s cars shorter than x (not longer with 'right')
+        tree = self.tree[s]
+        i = (bisect_left if side == 'left' else bisect_right)(self.sortedLength, x)
+        total = 0
+        while i:
+            total += tree[i]
+            i &= i - 1
+        return total
+
+    def kth(self, s, k):
+        # the k-th shortest car of side s (k from 0)
+        tree = self.tree[s]
+        n = len(tree) - 1
+        pos = 0
+        k += 1
+        step = 1 << n.bit_length() if n else 0
+        while step:
+            if pos + step <= n and tree[pos + step] < k:
+                pos += step
+                k -= tree[pos]
+            step >>= 1
+        return int(self.order[pos])
+
+    def sideCars(self, s):
+        # cars of side s in length order
+        return self.order[self.side[self.order] == s]
+
+    def setSide(self, car, side):
+        # move a car to another side updating the running totals and
+        # the rank counts of both sides
+        old = self.side[car]
+        length = float(self.length[car])
+        r = int(self.rank[car])
+        self._add(old, r, -1)
+        self._add(side, r, 1)
+        self.count[old] -= 1
+        self.count[side] += 1
+        self.lenSide[old] -= length
+        self.lenSide[side] += length
+        self.side[car] = side
+
+    def cost(self):
+        return max(self.lenSide)
 
-def plotSolution(df_bestSol):
-    df_sideA = copy.copy(df_bestSol[df_bestSol['side']=='A'])
-    df_sideA['offset'] = df_sideA['length'].shift(1).fillna(0).cumsum()
-    df_sideA.reset_index(drop=True, inplace=True)
 
-    df_sideB = copy.copy(df_bestSol[df_bestSol['side']=='B'])
-    df_sideB['offset'] = df_sideB['length'].shift(1).fillna(0).cumsum()
-    df_sideB.reset_index(drop=True, inplace=True)
+def laneNames(lanes):
+    # side labels A, B, ..., Z, AA, AB, ... by side index
+    names = []
+    for i in range(1, lanes + 1):
+        name = ''
+        while i:
+            i, r = divmod(i - 1, 26)
+            name = chr(ord('A') + r) + name
+        names.append(name)
+    return np.array(names)
 
+
+def sideIndex(df):
+    # side labels of a solution dataframe as side indexes
+    codes, labels = pd.factorize(df['side'])
+    index = []
+    for label in labels:
+        i = 0
+        for char in label:
+            i = i * 26 + ord(char) - ord('A') + 1
+        index.append(i - 1)
+    return np.array(index, dtype=np.int16)[codes]
+
+
+def toDataFrame(df, side, lanes=2):
+    # solution dataframe with the same shape as the input plus side
+    df_sol = df.copy()
+    df_sol['side'] = laneNames(lanes)[side]
+    return df_sol
+
+
+@traced
+def plotSolution(df_bestSol):
+    colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
     fig, ax = plt.subplots(figsize=(8, 4))
-    for idx, row in df_sideA.iterrows():
-        ax.barh(0, row['length'], left=row['offset'], align='edge')
+    side = sideIndex(df_bestSol)
+    n = 0
+    for row in range(max(int(side.max()) + 1, 2)):
+        # one bar collection per side, cars placed one after another
+        length = df_bestSol.loc[side==row, 'length'].to_numpy()
+        offset = np.cumsum(length) - length
+        ax.broken_barh(
+            list(zip(offset, length)), (row, 0.8),
+            facecolors=[colors[(n+i) % len(colors)] for i in range(len(length))])
+        n += len(length)
 
-    for idx, row in df_sideB.iterrows():
-        ax.barh(1, row['length'], left=row['offset'], align='edge')
-    
+    ax.autoscale()
     ax.set_title('parking sequence')
     ax.axis('off')
     return
 
 
-def calculateCost(df):
-    # calculate and return total lenght, side A lenght and side B length
-    lenA = df[df['side']=='A']['length'].sum()
-    lenB = df[df['side']=='B']['length'].sum()
-    
-    return max([lenA,lenB]), lenA, lenB
-
-
-def initSolution(df, alpha, sideMax=None):
-    # create a greed initial solution starting from random car
-    df_sol = copy.copy(df)
-    df_sol['side'] = None
-    randIndex = random.randint(0, len(df)-1)
-    df_sol.at[randIndex,'side'] = 'A'
-    while 1:
-        # define car sides until there are no more candidates
-        df_canditates = copy.copy(df_sol[df_sol['side'].isnull()])
-        if len(df_canditates) == 0:
-            return df_sol
-        
+def calculateCost(df, lanes=2):
+    # calculate and return total lenght followed by the length of every
+    # side (side A lenght, side B length, ...)
+    side = sideIndex(df)
+    length = df['length'].to_numpy(dtype=np.float64)
+    lenSide = np.array([
+        math.fsum(length[side==s])
+        for s in range(max(lanes, int(side.max()) + 1 if len(side) else 0))])
+
+    return (lenSide.max(), *lenSide)
+
+
+def _alive(link, p):
+    # path compressed lookup of the first unassigned sorted position
+    # reachable from p, assigned positions link to their neighbour
+    root = p
+    while link[root] != root:
+        root = link[root]
+    while link[p] != root:
+        link[p], p = root, link[p]
+    return root
+
+
+def _rankSample(u, alpha, m=None):
+    # candidate rank drawn with weights alpha^n for n < m (m=None is
+    # unbounded), the same weights the greedy randomization uses; alpha
+    # >= 1 is uniform over the m candidates, without m the rank is
+    # unbounded so the caller collects every candidate and draws again
+    if alpha <= 0:
+        return 0
+    if alpha >= 1:
+        return math.inf if m is None else int(u * m)
+    tail = 0 if m is None else pow(alpha, m)
+    n = int(math.log(1 - u * (1 - tail)) / math.log(alpha))
+    return n if m is None else min(n, m - 1)
+
+
+def constructSides(state, alpha, sideMax=None, rng=None):
+    # create a greedy randomized solution starting from a random car,
+    # unassigned cars are tracked in length order with skip links so
+    # the n-th best candidate is found without sorting candidates
+    rng = np.random.default_rng() if rng is None else rng
+    n = len(state.length)
+    sortedLength = state.sortedLength
+    nxt = list(range(n + 1))
+    prv = list(range(n + 1))
+    u = rng.random(n).tolist()
+
+    side = np.full(n, -1, dtype=np.int16)
+    lenSide = [0.0] * state.lanes
+    order = state.order.tolist()
+
+    def place(pos, s):
+        nxt[pos] = pos + 1
+        prv[pos + 1] = pos
+        side[order[pos]] = s
+        lenSide[s] += sortedLength[pos]
+
+    place(int(state.rank[rng.integers(n)]), 0)
+    # shortest side on top of a heap, the longest only ever grows
+    shortest = [(l, s) for s, l in enumerate(lenSide)]
+    heapq.heapify(shortest)
+    longest = lenSide[0]
+    for step in range(1, n):
+        lenA = lenSide[0]
         if sideMax is None:
-            # in case sideMax is None, try to greedly equilize both sides
-            lenMax, lenA, lenB = calculateCost(df_sol)
-            df_canditates['dif'] = abs(df_canditates['length'] - (lenA - lenB))
-            # add random variance to the greed part
-            n = random.choices(
-                list(range(0,len(df_canditates))),
-                weights=[pow(alpha,n) for n in range(0,len(df_canditates))]
-                )[0]
-            newIndex = df_canditates.sort_values(by='dif').iloc[n].name
-            if lenA > lenB:
-                df_sol.at[newIndex,'side'] = 'B'
-            else:
-                df_sol.at[newIndex,'side'] = 'A'
+            # in case sideMax is None, try to greedly equilize the sides
+            # giving the shortest one the car closest to the gap
+            lenS, s = shortest[0]
+            gap = longest - lenS
+            rank = _rankSample(u[step], alpha, n - step)
+            hi = _alive(nxt, bisect_left(sortedLength, gap))
+            lo = _alive(prv, hi) - 1
+            for _ in range(rank + 1):
+                if hi < n and (lo < 0 or sortedLength[hi] - gap <= gap - sortedLength[lo]):
+                    pos = hi
+                    hi = _alive(nxt, hi + 1)
+                else:
+                    pos = lo
+                    lo = _alive(prv, lo) - 1
+            place(pos, s)
+            heapq.heapreplace(shortest, (lenSide[s], s))
+            longest = max(longest, lenSide[s])
         else:
-            # in case sideMax is None, try to greedly fill the constraint
-            lenMax, lenA, lenB = calculateCost(df_sol)
-            df_canditates['dif'] = sideMax - lenA - df_canditates['length']
-            df_canditates = df_canditates[df_canditates['dif'] > 0]
-            if len(df_canditates):
-                # add random variance to the greed part
-                n = random.choices(
-                    list(range(0,len(df_canditates))),
-                    weights=[pow(alpha,n) for n in range(0,len(df_canditates))]
-                )[0]
-                newIndex = df_canditates.sort_values(by='dif').iloc[n].name
-                df_sol.at[newIndex,'side'] = 'A'
-            else:
-                df_sol['side'] = df_sol['side'].fillna('B')
-    return None
-
-
-def localSearch(df, sideMax=None):
-    # improve local solution by selecting a random car
-    # and trying to swap sides with the first improving option
-    bestVal,_,_ = calculateCost(df)
-    # add random variance to the local search
-    candidate_1 = df.iloc[random.randrange(1,len(df)-1)]
-    side_1 = candidate_1.side
-    if side_1 == 'A':
-        side_2 = 'B'
+            # in case sideMax is set, try to greedly fill the constraint
+            # with the longest cars that still fit in side A
+            rank = _rankSample(u[step], alpha)
+            candidates = []
+            pos = _alive(prv, bisect_left(sortedLength, sideMax - lenA)) - 1
+            while pos >= 0 and len(candidates) <= rank:
+                candidates.append(pos)
+                pos = _alive(prv, pos) - 1
+            if not candidates:
+                # remaining cars go to the other sides
+                rest = np.flatnonzero(side < 0)
+                side[rest] = lptSides(state.length[rest], state.lanes - 1) + 1
+                break
+            if rank >= len(candidates):
+                rank = _rankSample(rng.random(), alpha, len(candidates))
+            place(candidates[rank], 0)
+
+    # totals are recomputed once to drop the float drift of the sums
+    state.load(side)
+    return state
+
+
+def scoreMoves(state, cars, target, sideMax=None):
+    # score the best move of each car of one side s to side target t
+    # against the cached side lengths: moving length l gives lenS - l
+    # and lenT + l, swapping with a car of length x gives lenS - l + x
+    # and lenT + l - x, so the best partner is the side t car closest
+    # to l - (lenS - lenT)/2, found by binary search; the value of a
+    # move is the longer of the two sides afterwards
+    s = state.side[cars[0]]
+    t = target
+    lenS, lenT = state.lenSide[s], state.lenSide[t]
+    lenA = state.lenSide[0]
+    l = state.length[cars]
+    count = state.count[t]
+
+    # side t cars by index in length order: one car is looked up in the
+    # rank trees, many are searched in the side t lengths at once
+    if len(cars) == 1:
+        below = lambda x, side='left': np.array([state.below(t, float(x[0]), side)])
+        carAt = lambda k: np.array([state.kth(t, int(k[0]))])
+    else:
+        other = state.sideCars(t)
+        otherLength = state.length[other]
+        below = lambda x, side='left': np.searchsorted(otherLength, x, side=side)
+        carAt = lambda k: other[k]
+
+    # single flips
+    val = np.maximum(lenS - l, lenT + l)
+    partner = np.full(len(cars), -1)
+
+    # admissible partner indexes keeping side A within sideMax
+    lo = np.zeros(len(cars), dtype=np.int64)
+    hi = np.full(len(cars), count)
+    if sideMax is not None:
+        if s == 0:
+            val[lenA - l > sideMax] = np.inf
+            hi = below(sideMax - lenA + l, side='right')
+        elif t == 0:
+            val[lenA + l > sideMax] = np.inf
+            lo = below(lenA + l - sideMax)
+
+    # pair swaps with the two neighbours of the levelling length
+    if count:
+        pos = below(l - (lenS - lenT) / 2)
+        valid = lo < hi
+        top = np.maximum(hi - 1, lo)
+        for near in (pos - 1, pos):
+            near = np.minimum(np.clip(near, lo, top), count - 1)
+            car = carAt(near)
+            x = state.length[car]
+            swapVal = np.where(valid, np.maximum(lenS - l + x, lenT + l - x), np.inf)
+            better = swapVal < val
+            val = np.where(better, swapVal, val)
+            partner = np.where(better, car, partner)
+    return val, partner
+
+
+def applyMove(state, car, partner, target):
+    # move a car to the target side, swapping it with partner if set
+    s = state.side[car]
+    if partner >= 0:
+        state.setSide(partner, s)
+    state.setSide(car, target)
+    return
+
+
+def improveSides(state, sideMax=None, rng=None, search='first'):
+    # improve the solution with a flip or swap move between two sides
+    # that shortens the longer of them, search 'first' probes a random
+    # car against the shortest side (the longest from the shortest
+    # side) and takes its best move if it improves, search 'best' takes
+    # the best move from the longest side to any other side
+    lenSide = state.lenSide
+    longest = int(np.argmax(lenSide))
+    if search == 'first':
+        rng = np.random.default_rng() if rng is None else rng
+        car = int(rng.integers(len(state.length)))
+        s = state.side[car]
+        shortest = int(np.argmin(lenSide))
+        target = shortest if s != shortest else longest
+        if target == s:
+            return False
+        val, partner = scoreMoves(state, np.array([car]), target, sideMax)
+        val, partner = val[0], partner[0]
+        curVal = max(lenSide[s], lenSide[target])
     else:
-        side_2 = 'A'
-    df_test = copy.copy(df)
-    df_test.at[candidate_1.name,'side'] = side_2
-
-    df_pos = df[df['side'] != side_2]
-    df_pos = df_pos.sample(frac=1)
-    for idx, candidate_2 in df_pos.iterrows():
-        df_test.at[candidate_2.name, 'side'] = side_1
-        curVal,lenA,_ = calculateCost(df_test)
-        if sideMax is not None:
-            # if constraint is violated skip
-            if lenA > sideMax:
-                df_test.at[candidate_2.name, 'side'] = side_2
+        val = np.inf
+        cars = state.sideCars(longest)
+        for t in range(state.lanes):
+            if t == longest or not len(cars):
                 continue
+            sideVal, sidePartner = scoreMoves(state, cars, t, sideMax)
+            k = np.argmin(sideVal)
+            if sideVal[k] < val:
+                val, car, partner, target = sideVal[k], cars[k], sidePartner[k], t
+        curVal = lenSide[longest]
+    if not val < curVal - EPS:
+        return False
+    applyMove(state, car, partner, target)
+    return True
 
-        if curVal < bestVal:
-            return df_test
-        df_test.at[candidate_2.name, 'side'] = side_2
 
-    return df
+def lptSides(length, lanes=2, sideMax=None):
+    # longest processing time rule: cars by decreasing length go to the
+    # currently shortest side, kept on top of a heap; side A is passed
+    # over for cars that would exceed sideMax
+    length = np.asarray(length, dtype=np.float64)
+    side = np.zeros(len(length), dtype=np.int16)
+    shortest = [(0.0, s) for s in range(lanes)]
+    for car in np.argsort(-length, kind='stable').tolist():
+        l = float(length[car])
+        lenS, s = heapq.heappop(shortest)
+        if s == 0 and sideMax is not None and lenS + l > sideMax and shortest:
+            lenS, s = heapq.heapreplace(shortest, (lenS, s))
+        side[car] = s
+        heapq.heappush(shortest, (lenS + l, s))
+    return side
 
 
-def loopGRASP(df, loops, maxIter, alpha, sideMax=None,):
-    df_bestSol = None
-    bestVal = df['length'].sum()
-    for l in range(loops):
-        df_curSol = initSolution(df, alpha, sideMax)
-        i = 0
-        while i < maxIter:
-            df_curSol = localSearch(df_curSol,sideMax)
-            curVal,_,_ = calculateCost(df_curSol)
-            if curVal < bestVal:
-                df_bestSol = df_curSol
-                bestVal = curVal
-                print(bestVal)
-                i = 0
+def karmarkarKarpSides(length, lanes=2, sideMax=None):
+    # largest differencing method for k sides: every car starts as a
+    # partial split and the two partial splits with the largest spread
+    # are merged pairing the longest sides of one with the shortest of
+    # the other; side A gets the shortest side and is repaired to within
+    # sideMax afterwards
+    heap = []
+    n = len(length)
+    for car, l in enumerate(np.asarray(length, dtype=np.float64).tolist()):
+        heap.append((-l, car, [l] + [0.0] * (lanes - 1), [car] + [None] * (lanes - 1)))
+    heapq.heapify(heap)
+    count = len(heap)
+    while len(heap) > 1:
+        _, _, lenA, groupA = heapq.heappop(heap)
+        _, _, lenB, groupB = heapq.heappop(heap)
+        lenM = [a + b for a, b in zip(lenA, reversed(lenB))]
+        groupM = [
+            gb if ga is None else ga if gb is None else (ga, gb)
+            for ga, gb in zip(groupA, reversed(groupB))]
+        order = sorted(range(lanes), key=lenM.__getitem__, reverse=True)
+        base = lenM[order[-1]]
+        lenM = [lenM[i] - base for i in order]
+        heapq.heappush(heap, (-lenM[0], count, lenM, [groupM[i] for i in order]))
+        count += 1
+
+    # unfold the merged groups of every side into its cars
+    side = np.zeros(n, dtype=np.int16)
+    for s, group in enumerate(heap[0][3][::-1] if heap else []):
+        stack = [group]
+        while stack:
+            group = stack.pop()
+            if isinstance(group, tuple):
+                stack.extend(group)
+            elif group is not None:
+                side[group] = s
+    return repairSideMax(length, side, lanes, sideMax)
+
+
+def repairSideMax(length, side, lanes=2, sideMax=None):
+    # move cars off side A to the shortest other side until A is within
+    # sideMax: the shortest car that is enough on its own, else the
+    # longest one
+    if sideMax is None or lanes < 2:
+        return side
+    length = np.asarray(length, dtype=np.float64)
+    lenSide = np.bincount(side, length, minlength=lanes)
+    while lenSide[0] > sideMax + EPS:
+        cars = np.flatnonzero(side == 0)
+        excess = lenSide[0] - sideMax - EPS
+        enough = cars[length[cars] >= excess]
+        car = enough[np.argmin(length[enough])] if len(enough) else cars[np.argmax(length[cars])]
+        s = 1 + int(np.argmin(lenSide[1:]))
+        side[car] = s
+        lenSide[0] -= length[car]
+        lenSide[s] += length[car]
+    return side
+
+
+CONSTRUCTORS = {'lpt': lptSides, 'kk': karmarkarKarpSides}
+
+
+def initSolution(df, alpha, sideMax=None, lanes=2, method='grasp'):
+    # create a greed initial solution starting from random car, or with
+    # one of the CONSTRUCTORS
+    if method in CONSTRUCTORS:
+        side = CONSTRUCTORS[method](df['length'], lanes, sideMax)
+    else:
+        side = constructSides(CarSides(df['length'], lanes), alpha, sideMax).side
+    return toDataFrame(df, side, lanes)
+
+
+def localSearch(df, sideMax=None, search='first', lanes=2):
+    # improve local solution with the best flip or swap move of a
+    # random car, or of all cars of the longest side with search 'best'
+    state = CarSides(df['length'], max(lanes, int(sideIndex(df).max()) + 1))
+    state.load(sideIndex(df))
+    improveSides(state, sideMax, search=search)
+    return toDataFrame(df, state.side, state.lanes)
+
+
+def scaleLengths(length, maxDecimals=6):
+    # car lengths as integers in units of 10^-d for the smallest d that
+    # represents them exactly, None if they need more than maxDecimals
+    length = np.asarray(length, dtype=np.float64)
+    for d in range(maxDecimals + 1):
+        scaled = np.round(length * 10**d)
+        if np.all(np.abs(scaled - length * 10**d) < 1e-6):
+            return scaled.astype(np.int64), 10**d
+    return None, None
+
+
+def lowerBound(length, sideMax=None, lanes=2):
+    # no split is better than the longest car, an even share of the
+    # total length, or an even share of what exceeds sideMax among the
+    # other sides, rounded up to the length resolution when exact
+    scaled, scale = scaleLengths(length)
+    if scaled is None:
+        total = float(np.sum(length))
+        bound = max(total / lanes, float(np.max(length, initial=0)))
+        if sideMax is not None and lanes > 1:
+            bound = max(bound, (total - sideMax) / (lanes - 1))
+        return bound
+    total = int(scaled.sum())
+    bound = max(-(-total // lanes), int(np.max(scaled, initial=0)))
+    if sideMax is not None and lanes > 1:
+        bound = max(bound, -(-(total - math.floor(sideMax * scale + 1e-6)) // (lanes - 1)))
+    return bound / scale
+
+
+def exactSplit(length, sideMax=None, maxCells=2*10**7):
+    # exact split as a subset-sum over scaled integer lengths: side A
+    # takes the largest reachable sum within half the total (and within
+    # sideMax), side B the rest; returns None when the lengths are not
+    # exact decimals or the dp would need more than maxCells sums
+    scaled, scale = scaleLengths(length)
+    if scaled is None:
+        return None
+    total = int(scaled.sum())
+    cap = total // 2
+    if sideMax is not None:
+        cap = max(min(cap, math.floor(sideMax * scale + 1e-6)), 0)
+    if cap + 1 > maxCells:
+        return None
+
+    # equal lengths are bundled in binary split counts 1, 2, 4, ...
+    values, counts = np.unique(scaled, return_counts=True)
+    bundles = []
+    for value, count in zip(values.tolist(), counts.tolist()):
+        k = 1
+        while count > 0:
+            bundles.append((value, min(k, count)))
+            count -= k
+            k *= 2
+
+    # bitset dp recording the first bundle that reaches every sum
+    reach = np.zeros(cap + 1, dtype=bool)
+    reach[0] = True
+    first = np.full(cap + 1, -1, dtype=np.int32)
+    for b, (value, k) in enumerate(bundles):
+        w = value * k
+        if w == 0 or w > cap or reach[cap]:
+            continue
+        new = np.flatnonzero(reach[:cap + 1 - w] & ~reach[w:]) + w
+        first[new] = b
+        reach[new] = True
+
+    # walk back the bundles, each sum was reached from an earlier one
+    taken = dict.fromkeys(values.tolist(), 0)
+    s = int(np.flatnonzero(reach)[-1])
+    while s > 0:
+        value, k = bundles[first[s]]
+        taken[value] += k
+        s -= value * k
+
+    side = np.ones(len(scaled), dtype=np.int16)
+    for value, k in taken.items():
+        side[np.flatnonzero(scaled == value)[:k]] = 0
+    return side
+
+
+@traced
+def solveExact(df, sideMax=None, maxCells=2*10**7):
+    # exact parking split as a dataframe, None when the dp does not fit
+    side = exactSplit(df['length'], sideMax, maxCells)
+    return toDataFrame(df, side) if side is not None else None
+
+
+def graspRestart(state, maxIter, alpha, sideMax, search, rng, bound=0, initial=None, stats=None):
+    # one GRASP restart: greedy randomized construction (or an initial
+    # side assignment) followed by local search until maxIter probes in
+    # a row fail to improve, a failed best improvement step is already
+    # a local optimum; stats counts the restarts, probes and moves
+    if initial is None:
+        constructSides(state, alpha, sideMax, rng)
+    else:
+        state.load(initial)
+    i = 0
+    probes = moves = 0
+    while i < maxIter and state.cost() > bound + EPS:
+        probes += 1
+        if improveSides(state, sideMax, rng, search):
+            moves += 1
+            i = 0
+        elif search == 'best':
+            break
+        else:
             i += 1
+    state.load(state.side)
+    if stats is not None:
+        stats['restarts'] += 1
+        stats['probes'] += probes
+        stats['moves'] += moves
+    return state.cost()
+
+
+def graspStats():
+    # zero restart, probe and move counters
+    return {'restarts': 0, 'probes': 0, 'moves': 0}
+
+
+def _initWorker(stopAt):
+    # share the first restart index that reached the lower bound
+    global _stopAt
+    _stopAt = stopAt
+
 
-    # print(df_bestSol)
-        print(calculateCost(df_bestSol))
+def _graspWorker(length, lanes, restarts, maxIter, alpha, sideMax, search, bound):
+    # run a worker share of the restarts in index order, skipping those
+    # after a restart that already reached the lower bound; returns the
+    # best restart and the counters of the share
+    state = CarSides(length, lanes)
+    best = None
+    stats = graspStats()
+    for r, seq in restarts:
+        if r > _stopAt.value:
+            break
+        curVal = graspRestart(state, maxIter, alpha, sideMax, search,
+            np.random.default_rng(seq), bound, stats=stats)
+        if best is None or (round(curVal, 9), r) < best[0]:
+            best = (round(curVal, 9), r), curVal, state.side.copy()
+        if curVal <= bound + EPS:
+            with _stopAt.get_lock():
+                _stopAt.value = min(_stopAt.value, r)
+            break
+    return best, stats
 
-    plotSolution(df_bestSol)
+
+@traced
+def loopGRASP(df, loops, maxIter, alpha, sideMax=None, search='first',
+        seed=None, workers=None, exact=False, lanes=2, seeds=(), plot=True):
+    # restart r draws from the r-th child of the seed sequence and the
+    # best restart wins with ties going to the lowest index, so a fixed
+    # seed gives the same result for any number of workers; restarts
+    # stop once one reaches the lower bound, or the proven optimum of
+    # the exact split when exact is set and the dp fits; seeds names
+    # CONSTRUCTORS whose solutions are improved ahead of the restarts;
+    # plot draws the best split. Every improvement of the best split is
+    # kept with its seconds and restart as the trajectory
+    seq = np.random.SeedSequence(seed)
+    children = seq.spawn(loops + len(seeds))
+    restarts = list(enumerate(children[:loops]))
+    state = CarSides(df['length'], lanes)
+    bound = lowerBound(state.length, sideMax, lanes)
+    if exact and lanes == 2:
+        side = exactSplit(state.length, sideMax)
+        if side is not None:
+            state.load(side)
+            bound = state.cost()
+    best = None
+    tic = time.perf_counter()
+    stats = graspStats()
+    trajectory = []
+
+    def improved(r, curVal):
+        trajectory.append((time.perf_counter() - tic, r, curVal))
+        record('grasp_improvement', restart=r, value=curVal, seconds=trajectory[-1][0])
+
+    for i, method in enumerate(seeds):
+        r = i - len(seeds)
+        curVal = graspRestart(state, maxIter, alpha, sideMax, search,
+            np.random.default_rng(children[loops + i]), bound,
+            CONSTRUCTORS[method](state.length, lanes, sideMax), stats)
+        if best is None or (round(curVal, 9), r) < best[0]:
+            best = (round(curVal, 9), r), curVal, state.side.copy()
+            improved(r, curVal)
+            print(curVal)
+    if best is not None and best[1] <= bound + EPS:
+        restarts = []
+
+    # the first restart runs here and times the others: a pool only
+    # pays when they would take longer than POOL_SECONDS per worker, the
+    # start of a worker process, and with more than one core. Small
+    # instances stop at the bound within a few restarts and stay serial
+    workers = min(workers or 1, os.cpu_count() or 1)
+    done = 0
+    for r, child in restarts:
+        if done == 1 and workers > 1 and \
+                (time.perf_counter() - first)*(len(restarts) - 1) > POOL_SECONDS*workers:
+            break
+        first = time.perf_counter()
+        curVal = graspRestart(state, maxIter, alpha, sideMax, search,
+            np.random.default_rng(child), bound, stats=stats)
+        done += 1
+        if best is None or (round(curVal, 9), r) < best[0]:
+            best = (round(curVal, 9), r), curVal, state.side.copy()
+            improved(r, curVal)
+            print(curVal)
+        if curVal <= bound + EPS:
+            done = len(restarts)
+            break
+    restarts = restarts[done:]
+
+    if restarts:
+        stopAt = multiprocessing.Value('q', loops)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_initWorker,
+                initargs=(stopAt,)) as executor:
+            futures = [
+                executor.submit(_graspWorker, state.length, lanes, restarts[w::workers],
+                    maxIter, alpha, sideMax, search, bound)
+                for w in range(workers)]
+            for future in futures:
+                result, workerStats = future.result()
+                for key in stats:
+                    stats[key] += workerStats[key]
+                if result is not None and (best is None or result[0] < best[0]):
+                    best = result
+                    improved(result[0][1], result[1])
+        print(best[1])
+
+    bestSide = best[2]
+    state.load(bestSide)
+    print(best[1], *state.lenSide)
+    record('grasp', cars=len(state.length), lanes=lanes, loops=loops, workers=workers,
+        bound=bound, best=best[1], seconds=time.perf_counter() - tic, trajectory=trajectory, **stats)
+
+    df_bestSol = toDataFrame(df, bestSide, lanes)
+    if plot:
+        plotSolution(df_bestSol)
     return df_bestSol
 
 
@@ -151,6 +720,16 @@ if __name__ == '__main__':
 
     val = calculateCost(limSideResult)
     print('best car splits with 15 constraint: total = {:.2f}, side A = {:.2f}, side B = {:.2f}'.format(val[0],val[1],val[2]))
+
+    val = calculateCost(solveExact(df_cars))
+    print('exact car splits: total = {:.2f}, side A = {:.2f}, side B = {:.2f}'.format(val[0],val[1],val[2]))
+
+    val = calculateCost(solveExact(df_cars, 15))
+    print('exact car splits with 15 constraint: total = {:.2f}, side A = {:.2f}, side B = {:.2f}'.format(val[0],val[1],val[2]))
+
+    lanesResult = loopGRASP(df_cars, 25, 100, 0.75, None, lanes=3, seeds=('lpt', 'kk'))
+    val = calculateCost(lanesResult, 3)
+    print('best car splits in 3 lanes: total = {:.2f}, side A = {:.2f}, side B = {:.2f}, side C = {:.2f}'.format(*val))
     
     plt.show()
-    pass
\ No newline at end of file
+    pass
@@ -0,0 +1,231 @@
+# This script keeps solved instances of problem1_2 and problem2 in a
+# sqlite file: the key is a hash of the instance data (sorted, so the
+# row order doesn't matter), the model options and the solver settings,
+# and the value the solutionToPandas dataframes with the objective
+# values. A hit skips the model build and the solve; a miss may start
+# from the cached solution of the most recently used instance with the
+# same jobs (or pipes). The file is kept under a size bound by dropping
+# the least recently used results
+import json
+import time
+import pickle
+import sqlite3
+import hashlib
+import pyomo.environ as pyo
+import problem1_2
+import problem2
+from schedule_bounds import ArcIndex, listSchedule
+from schedule_heuristic import heuristicSchedule
+from solution_io import varFrame, writeFrames
+from solver_config import SolverConfig
+from solver_portfolio import buildProblem2
+from instrument import phase
+
+CACHE = 'results_cache.sqlite'
+
+# bump when a formulation changes so older results are not reused
+CACHE_VERSION = 1
+
+
+class ResultCache():
+    # results by key in a sqlite file, with the problem and a signature
+    # of the instance for near matches; at most maxBytes of results are
+    # kept, the least recently used go first
+    def __init__(self, path=CACHE, maxBytes=256 << 20):
+        self.path = path
+        self.maxBytes = maxBytes
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.execute(
+            'create table if not exists results (key text primary key, problem text, signature text, '
+            'created real, used real, size integer, payload blob)')
+        self.db.execute('create index if not exists results_near on results (problem, signature, used)')
+        self.db.execute('create index if not exists results_used on results (used)')
+        self.db.commit()
+
+    def get(self, key):
+        # stored result of key, None when there is none
+        row = self.db.execute('select payload from results where key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        self.db.execute('update results set used = ? where key = ?', (time.time(), key))
+        self.db.commit()
+        return pickle.loads(row[0])
+
+    def nearest(self, problem, signature, key=None):
+        # most recently used result of another instance with the same
+        # signature, None when there is none
+        row = self.db.execute(
+            'select payload from results where problem = ? and signature = ? and key != ? '
+            'order by used desc limit 1', (problem, signature, key or '')).fetchone()
+        return None if row is None else pickle.loads(row[0])
+
+    def put(self, key, problem, signature, payload):
+        # store a result and evict down to maxBytes
+        blob = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        self.db.execute('insert or replace into results values (?, ?, ?, ?, ?, ?, ?)',
+            (key, problem, signature, now, now, len(blob), sqlite3.Binary(blob)))
+        self.evict()
+        self.db.commit()
+        return
+
+    def evict(self):
+        # drop the least recently used results while over maxBytes
+        total = self.db.execute('select coalesce(sum(size), 0) from results').fetchone()[0]
+        if total <= self.maxBytes:
+            return
+        for key, size in self.db.execute('select key, size from results order by used').fetchall():
+            if total <= self.maxBytes:
+                break
+            self.db.execute('delete from results where key = ?', (key,))
+            total -= size
+        return
+
+    def close(self):
+        self.db.close()
+
+
+def digest(*parts):
+    # sha256 of the parts as canonical json
+    text = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def jobsDigest(dict_job):
+    # hash of the jobs sorted by id, and of the ids alone as signature
+    list_job = sorted(dict_job)
+    rows = [[j] + [float(getattr(dict_job[j], c)) for c in
+        ['process_time', 'setup_time', 'release_time', 'deadline']] for j in list_job]
+    return digest(rows), digest(list_job)
+
+
+def containersDigest(df_containers):
+    # hash of the sheet sorted by container, order and pipe, and of
+    # those keys alone as signature
+    columns = ['Container', 'Sales Order', 'Steel Pipe', 'Steel Pipe weight (kg)', 'Steel Pipe volume (m³)']
+    df = df_containers[columns].sort_values(columns[:3], kind='stable')
+    data = hashlib.sha256(df.to_csv(index=False).encode()).hexdigest()
+    keys = hashlib.sha256(df[columns[:3]].to_csv(index=False).encode()).hexdigest()
+    return data, keys
+
+
+def configOptions(config):
+    # solver settings that change a result
+    return {k: getattr(config, k) for k in ['name', 'timeLimit', 'gap', 'threads', 'seed']}
+
+
+def optimal(result):
+    return str(result.solver.termination_condition) == 'optimal'
+
+
+def cachedProblem1_2(dict_job, config=None, cache=None, tightBigM=True, warm=True, file='problem1_output.xlsx'):
+    # problem1_2 delay and makespan solves through the cache, returns
+    # df_varTime, df_varDelay and the (delay, makespan) objectives; on a
+    # miss the better of the heuristic schedule and the job order of a
+    # near match starts the solve, optimal results are stored
+    config = SolverConfig('glpk') if config is None else config
+    cache = ResultCache() if cache is None else cache
+    data, signature = jobsDigest(dict_job)
+    key = digest(CACHE_VERSION, 'problem1_2', data, {'tightBigM': tightBigM}, configOptions(config))
+    saved = cache.get(key)
+    if saved is not None:
+        print('cache hit {}'.format(key[:12]))
+        writeFrames(saved['frames'], file)
+        return saved['frames']['varTime'], saved['frames']['varDelay'], saved['objective']
+
+    # incumbent: heuristic schedule or the order of a near match
+    order, _, heurDelay, heurMakeSpan, _ = heuristicSchedule(dict_job, lexicographic=True)
+    near = cache.nearest('problem1_2', signature, key) if warm else None
+    if near is not None:
+        start, nearDelay, end = listSchedule(dict_job, near['order'])
+        nearMakeSpan = end - (start[near['order'][0]] - dict_job[near['order'][0]].setup_time)
+        if (nearDelay, nearMakeSpan) < (heurDelay, heurMakeSpan):
+            print('warm start from a cached order: delay {} make span {}'.format(nearDelay, nearMakeSpan))
+            order, heurDelay = near['order'], nearDelay
+
+    model = pyo.ConcreteModel()
+    problem1_2.buildVars(model, dict_job, ArcIndex(dict_job, maxDelay=heurDelay))
+    problem1_2.buildConstraints(model, dict_job, tightBigM)
+    problem1_2.buildObjective(model, dict_job)
+    problem1_2.loadStart(model, dict_job, order)
+    problem1_2.addCutoff(model, heurDelay)
+
+    # delay, then makespan under that delay
+    model.obj2.deactivate()
+    result = config.solve(model, load_solutions=False)
+    solved = len(result.solution) > 0 and optimal(result)
+    if len(result.solution) > 0:
+        model.solutions.load_from(result)
+        totalDelay = problem1_2.fixDelay(model, dict_job, pyo.value(model.obj1) + 1e-6)
+        result = config.solve(model, load_solutions=False)
+        solved = solved and len(result.solution) > 0 and optimal(result)
+        if len(result.solution) > 0:
+            model.solutions.load_from(result)
+
+    df_varTime, df_varDelay = problem1_2.solutionToPandas(model, file)
+    objective = (float(df_varDelay['val'].sum()), model.varMakeSpan.value)
+    if solved:
+        frames = {
+            'varSeq': varFrame(model.varSeq, ['prev_job','cur_job'], threshold=0.1),
+            'varTime': df_varTime, 'varDelay': df_varDelay}
+        cache.put(key, 'problem1_2', signature, {
+            'frames': frames, 'objective': objective,
+            'order': sorted(dict_job, key=lambda j: model.varTime[j].value)})
+    return df_varTime, df_varDelay, objective
+
+
+def cachedProblem2(df_containers, targets=None, config=None, cache=None, exclude=(), warm=True, file=None):
+    # problem2 plan through the cache as the df_varPipes dataframe,
+    # excluding the plans in exclude (lists of (c, o, p) pipes); on a
+    # miss the plan of a near match starts the solve, optimal results
+    # are stored
+    config = SolverConfig('glpk') if config is None else config
+    cache = ResultCache() if cache is None else cache
+    targets = (problem2.CONTAINERS, problem2.WEIGHT, problem2.VOLUME) if targets is None else tuple(targets)
+    data, signature = containersDigest(df_containers)
+    exclude = [sorted(tuple(cop) for cop in plan) for plan in exclude]
+    key = digest(CACHE_VERSION, 'problem2', data, targets, sorted(exclude), configOptions(config))
+    saved = cache.get(key)
+    if saved is not None:
+        print('cache hit {}'.format(key[:12]))
+        writeFrames(saved['frames'], file)
+        return saved['frames']['varPipes']
+
+    with phase('problem2.Containers'):
+        containers = problem2.Containers(df_containers)
+    model = buildProblem2(containers, targets)
+    for plan in exclude:
+        problem2.addNoGood(model, plan)
+    near = cache.nearest('problem2', signature, key) if warm else None
+    if near is not None:
+        print('warm start from a cached plan of {} pipes'.format(len(near['plan'])))
+        chosen = set(near['plan'])
+        for cop, v in model.varPipes.items():
+            v.set_value(1 if cop in chosen else 0)
+        used = {cop[0] for cop in chosen}
+        for c, v in model.varContainers.items():
+            v.set_value(1 if c in used else 0)
+
+    result = config.solve(model, load_solutions=False)
+    if len(result.solution) > 0:
+        model.solutions.load_from(result)
+    else:
+        # no plan left: drop the start so the dataframe comes out empty
+        print('no plan: {}'.format(result.solver.termination_condition))
+        for v in model.varPipes.values():
+            v.set_value(None)
+    df_varPipes = problem2.solutionToPandas(model, containers, file)
+    if len(result.solution) > 0 and optimal(result):
+        plan = [cop for cop, v in model.varPipes.items() if v.value > 0.5]
+        cache.put(key, 'problem2', signature, {'frames': {'varPipes': df_varPipes}, 'plan': plan})
+    return df_varPipes
+
+
+if __name__ == '__main__':
+    # the jobs of jobs.csv twice: the second run is a cache hit
+    from job_table import loadJobs
+    dict_job = loadJobs('jobs.csv')
+    for k in range(2):
+        tic = time.perf_counter()
+        df_varTime, df_varDelay, (totalDelay, makeSpan) = cachedProblem1_2(dict_job)
+        print('run {}: delay {} make span {} in {:.2f}s'.format(k, totalDelay, makeSpan, time.perf_counter() - tic))
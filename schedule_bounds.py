@@ -0,0 +1,75 @@
+# This script derives time window bounds and the admissible sequence
+# arcs from the job data, shared by the scheduling formulations of
+# problem1 and problem1_2
+from instrument import record
+
+
+def horizon(dict_job):
+    # after the last release the machine never has to wait, so some
+    # optimal schedule finishes every job by the last release plus the
+    # total setup and process time
+    return (
+        max(job.release_time for job in dict_job.values())
+        +
+        sum(job.setup_time + job.process_time for job in dict_job.values())
+    )
+
+
+def startBounds(dict_job):
+    # earliest and latest start of every job and of the '' dummy start
+    # a job can't start before its release nor before its setup ends,
+    # and must finish within the horizon (deadlines are soft, so they
+    # don't bound the start)
+    end = horizon(dict_job)
+    earliest = {'': 0}
+    latest = {'': end}
+    for j, job in dict_job.items():
+        earliest[j] = max(job.release_time, job.setup_time)
+        latest[j] = end - job.process_time
+    return earliest, latest
+
+
+def listSchedule(dict_job, order):
+    # start every job of the order as soon as its setup is done and it
+    # is released, returns the start times, total delay and makespan
+    start = {}
+    end = 0
+    for j in order:
+        job = dict_job[j]
+        start[j] = max(end + job.setup_time, job.release_time)
+        end = start[j] + job.process_time
+    totalDelay = sum(max(start[j] - dict_job[j].deadline, 0) for j in order)
+    return start, totalDelay, end
+
+
+def eddOrder(dict_job):
+    # earliest due date order, ties by release time
+    return sorted(dict_job, key=lambda j: (dict_job[j].deadline, dict_job[j].release_time))
+
+
+class ArcIndex():
+    # sparse index of the admissible (j1, j2) sequence arcs, '' being the
+    # dummy start; an arc is dropped when j2 can't start within the
+    # horizon after j1, or when it forces a delay on j2 above maxDelay
+    # (any delay a known schedule proves to be too costly)
+    def __init__(self, dict_job, maxDelay=None):
+        list_job = list(dict_job.keys())
+        earliest, latest = startBounds(dict_job)
+        self.arcs = []
+        self.dict_in = {j: [] for j in list_job + ['']}
+        self.dict_out = {j: [] for j in list_job + ['']}
+        for j1 in list_job + ['']:
+            end1 = earliest[j1] + (dict_job[j1].process_time if j1 != '' else 0)
+            for j2 in list_job:
+                if j1 == j2:
+                    continue
+                start2 = max(end1 + dict_job[j2].setup_time, earliest[j2])
+                if j1 != '' and (
+                    start2 > latest[j2]
+                    or (maxDelay is not None and start2 - dict_job[j2].deadline > maxDelay)):
+                    continue
+                self.arcs.append((j1, j2))
+                self.dict_in[j2].append(j1)
+                self.dict_out[j1].append(j2)
+        self.removed = len(list_job) * len(list_job) - len(self.arcs)
+        record('arc_index', kept=len(self.arcs), removed=self.removed)
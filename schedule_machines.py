@@ -0,0 +1,168 @@
+# This script schedules jobs on m parallel machines: jobs are assigned
+# to machines by a load balancing rule or a master milp, each machine
+# sequence is a problem1_2 subproblem solved in a worker process, and
+# the assignment is repaired by moving jobs off the worst machine while
+# the time budget lasts
+import os
+import time
+import pyomo.environ as pyo
+from concurrent.futures import ProcessPoolExecutor
+from schedule_bounds import listSchedule, eddOrder
+from job_table import loadJobs
+from schedule_heuristic import heuristicSchedule
+from schedule_rolling import solveWindow
+from solver_config import SolverConfig
+
+
+def assignGreedy(dict_job, machines):
+    # earliest completion: jobs in edd order go to the machine that
+    # finishes them first
+    ends = [0]*machines
+    assign = [[] for m in range(machines)]
+    for j in eddOrder(dict_job):
+        job = dict_job[j]
+        finish = [max(end + job.setup_time, job.release_time) + job.process_time for end in ends]
+        m = finish.index(min(finish))
+        ends[m] = finish[m]
+        assign[m].append(j)
+    return assign
+
+
+def assignMaster(dict_job, machines, config=None):
+    # master milp balancing the setup plus process time of the machines
+    list_job = list(dict_job.keys())
+    model = pyo.ConcreteModel()
+    model.setJobs = pyo.Set(initialize=list_job)
+    model.setMachines = pyo.RangeSet(0, machines - 1)
+    model.varAssign = pyo.Var(model.setJobs, model.setMachines, domain=pyo.Binary)
+    model.varLoad = pyo.Var(domain=pyo.NonNegativeReals)
+
+    def constrSingle(model, job):
+        return sum(model.varAssign[job, m] for m in model.setMachines) == 1
+    model.constrSingle = pyo.Constraint(model.setJobs, rule=constrSingle)
+
+    def constrLoad(model, m):
+        return sum(
+            model.varAssign[j, m]*(dict_job[j].setup_time + dict_job[j].process_time)
+            for j in model.setJobs) <= model.varLoad
+    model.constrLoad = pyo.Constraint(model.setMachines, rule=constrLoad)
+    model.obj1 = pyo.Objective(expr=model.varLoad, sense=pyo.minimize)
+
+    config = SolverConfig('glpk') if config is None else config
+    config.solve(model)
+    return [[j for j in list_job if model.varAssign[j, m].value > 0.5] for m in model.setMachines]
+
+
+def machineCost(dict_job, order):
+    # total delay and makespan from the first setup of one machine
+    if not order:
+        return 0, 0
+    start, totalDelay, end = listSchedule(dict_job, order)
+    return totalDelay, end - (start[order[0]] - dict_job[order[0]].setup_time)
+
+
+def _machineWorker(dict_job, config):
+    # sequence of one machine by the lexicographic problem1_2 solve
+    if not dict_job:
+        return []
+    return solveWindow(dict_job, config)
+
+
+def scheduleMachines(dict_job, machines, assign='greedy', workers=None,
+        config=None, timeBudget=60, moves=3):
+    # all machines are sequenced concurrently, then each round takes the
+    # machine with the most delay (then the longest makespan), proposes
+    # moving its most delayed jobs to every other machine, scores the
+    # proposals with the heuristic and solves the best workers of them
+    # concurrently; the best improving move is kept, a job that doesn't
+    # improve anything is not proposed again. Sequences are cached by
+    # job set so no set is solved twice. Every solve is capped by what is
+    # left of timeBudget, split over the two phases of each machine and
+    # the batches the workers run one after another; once it is spent
+    # the heuristic sequence stands in
+    tic = time.perf_counter()
+    workers = workers or os.cpu_count()
+    config = SolverConfig('glpk') if config is None else config
+    if assign == 'master':
+        sets = assignMaster(dict_job, machines, config.limited(timeBudget))
+    else:
+        sets = assignGreedy(dict_job, machines)
+    sets = [frozenset(s) for s in sets]
+    cache = {}
+
+    def cost(s):
+        return machineCost(dict_job, cache[s])
+
+    def total(sets):
+        costs = [cost(s) for s in sets]
+        return sum(c[0] for c in costs), max(c[1] for c in costs)
+
+    def heurCost(s):
+        return machineCost(dict_job, heuristicSchedule({j: dict_job[j] for j in s}, lexicographic=True)[0])
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        def solve(list_set):
+            list_set = [s for s in dict.fromkeys(list_set) if s not in cache]
+            left = timeBudget - (time.perf_counter() - tic)
+            if left <= 0:
+                for s in list_set:
+                    cache[s] = heuristicSchedule({j: dict_job[j] for j in s}, lexicographic=True)[0]
+                return
+            batches = -(-len(list_set) // workers)
+            limited = config.limited(left / (2 * max(batches, 1)))
+            futures = [executor.submit(_machineWorker, {j: dict_job[j] for j in s}, limited)
+                for s in list_set]
+            for s, future in zip(list_set, futures):
+                cache[s] = future.result()
+
+        solve(sets)
+        best = total(sets)
+        print('assignment {}: delay {} makespan {}'.format(assign, *best))
+        tried = set()
+        while time.perf_counter() - tic < timeBudget:
+            worst = max(range(machines), key=lambda m: cost(sets[m]))
+            order = cache[sets[worst]]
+            start, _, _ = listSchedule(dict_job, order) if order else ({}, 0, 0)
+            jobs = sorted(
+                (j for j in order if j not in tried),
+                key=lambda j: (start[j] - dict_job[j].deadline, start[j]), reverse=True)[:moves]
+            if not jobs:
+                break
+
+            # heuristic score of every move, the best are solved
+            proposals = []
+            for j in jobs:
+                for m in range(machines):
+                    if m == worst:
+                        continue
+                    new = list(sets)
+                    new[worst], new[m] = sets[worst] - {j}, sets[m] | {j}
+                    changed = [heurCost(new[worst]), heurCost(new[m])]
+                    others = [cost(sets[k]) for k in range(machines) if k not in (worst, m)]
+                    costs = changed + others
+                    proposals.append(((sum(c[0] for c in costs), max(c[1] for c in costs)), j, new))
+            proposals.sort(key=lambda p: p[0])
+            proposals = proposals[:workers]
+            solve([s for p in proposals for s in p[2]])
+
+            value, j, new = min(((total(p[2]), p[1], p[2]) for p in proposals), key=lambda r: r[0])
+            if value < best:
+                best, sets = value, new
+                print('move {}: delay {} makespan {}'.format(j, *best))
+            else:
+                tried.update(jobs)
+
+    return [cache[s] for s in sets], best
+
+
+if __name__ == '__main__':
+    # read input csv and create jobs objects
+    dict_job = loadJobs('jobs.csv')
+
+    tic = time.perf_counter()
+    orders, (totalDelay, makeSpan) = scheduleMachines(dict_job, 2, timeBudget=30)
+    print('two machines in {:.2f}s'.format(time.perf_counter() - tic))
+    for m, order in enumerate(orders):
+        print('machine {}: {}'.format(m, order))
+    print('total make span: ', makeSpan)
+    print('total delay: ', totalDelay)
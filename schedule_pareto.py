@@ -0,0 +1,112 @@
+# This script traces the delay vs makespan tradeoff of problem1_2 with
+# the epsilon-constraint method: the total delay bound of
+# constrMaxDeadline is swept between the two lexicographic optima and
+# every level is solved on its own model in a worker process
+import os
+import time
+import numpy as np
+import pandas as pd
+import pyomo.environ as pyo
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from problem1_2 import buildVars, buildConstraints, buildObjective, fixDelay, loadStart
+from schedule_bounds import listSchedule, ArcIndex
+from job_table import loadJobs
+from schedule_heuristic import heuristicSchedule
+from solver_config import SolverConfig, loadSolution
+from schedule_rolling import solveWindow, solvedOrder
+
+
+def _delayWorker(dict_job, config):
+    # order of the delay first lexicographic optimum
+    return solveWindow(dict_job, config)
+
+
+def _frontWorker(dict_job, maxDelay, order, config):
+    # minimize the makespan with the total delay bounded by maxDelay (no
+    # bound for the makespan optimum), then the delay at that makespan so
+    # the point is not dominated; order is a schedule within the bound.
+    # None when the makespan solve ends without a solution, a delay solve
+    # without one keeps the makespan solution
+    model = pyo.ConcreteModel()
+    buildVars(model, dict_job, ArcIndex(dict_job, maxDelay=maxDelay))
+    buildConstraints(model, dict_job)
+    buildObjective(model, dict_job)
+    loadStart(model, dict_job, order)
+    if maxDelay is None:
+        model.obj1.deactivate()
+        model.obj2.activate()
+    else:
+        fixDelay(model, dict_job, maxDelay)
+    if not loadSolution(model, config.solve(model, load_solutions=False)):
+        return None
+
+    makeSpan = model.varMakeSpan.value
+    model.constrMaxMakeSpan = pyo.Constraint(expr=model.varMakeSpan <= makeSpan + 1e-6)
+    model.obj2.deactivate()
+    model.obj1.activate()
+    loadSolution(model, config.solve(model, load_solutions=False))
+    totalDelay = sum(model.varDelay[j].value for j in dict_job)
+    return maxDelay, round(totalDelay, 6), round(makeSpan, 6), solvedOrder(model, dict_job)
+
+
+def paretoFront(dict_job, points=8, workers=None, config=None):
+    # both lexicographic optima first, then points delay bounds evenly
+    # between their delays; a level is submitted once a worker is free
+    # and starts from the schedule of the closest solved level below it,
+    # which is within its bound. Levels without a solution are left
+    # out, the heuristic schedule stands in for the makespan optimum
+    workers = workers or os.cpu_count()
+    config = SolverConfig('glpk') if config is None else config
+    rows = []
+    solved = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        heurOrder = heuristicSchedule(dict_job, lexicographic=True)[0]
+        lower = executor.submit(_delayWorker, dict_job, config)
+        upper = executor.submit(_frontWorker, dict_job, None, heurOrder, config)
+        order = lower.result()
+        _, minDelay, _ = listSchedule(dict_job, order)
+        row = upper.result()
+        if row is None:
+            start, totalDelay, end = listSchedule(dict_job, heurOrder)
+            row = None, totalDelay, end - (start[heurOrder[0]] - dict_job[heurOrder[0]].setup_time), heurOrder
+        rows.append(row)
+        maxDelay = rows[0][1]
+        solved[-np.inf] = order
+
+        pending = sorted(set(np.linspace(minDelay, maxDelay, points).round(6).tolist())) \
+            if maxDelay > minDelay + 1e-6 else []
+        running = {}
+        while pending or running:
+            while pending and len(running) < workers:
+                level = pending.pop(0)
+                start = solved[max(l for l in solved if l <= level)]
+                running[executor.submit(_frontWorker, dict_job, level, start, config)] = level
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                level = running.pop(future)
+                row = future.result()
+                if row is None:
+                    print('delay bound {}: no solution'.format(level))
+                    continue
+                rows.append(row)
+                solved[level] = row[3]
+
+    # table of the non dominated points by increasing delay, up to the
+    # solver tolerance
+    df_front = pd.DataFrame(rows, columns=['delay_bound', 'total_delay', 'make_span', 'order'])
+    df_front = df_front.sort_values(by=['total_delay', 'make_span']).reset_index(drop=True)
+    df_front = df_front[
+        df_front['make_span'] < df_front['make_span'].cummin().shift(fill_value=np.inf) - 1e-4]
+    df_front['order'] = df_front['order'].apply(' > '.join)
+    return df_front.reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    # read input csv and create jobs objects
+    dict_job = loadJobs('jobs.csv')
+
+    tic = time.perf_counter()
+    df_front = paretoFront(dict_job, points=6)
+    print('pareto front in {:.2f}s'.format(time.perf_counter() - tic))
+    with pd.option_context('display.max_colwidth', None, 'display.width', 200):
+        print(df_front)
@@ -0,0 +1,351 @@
+# This script keeps the problem1_2 scheduling model alive between
+# solves: job attributes live in mutable params, jobs are added and
+# removed row by row instead of rebuilding the model, and every solve
+# is warm started from the previous schedule through a persistent
+# appsi solver (glpk has no persistent interface, highs is used). The
+# big-M of every arc is a mutable param tightened by the delay of the
+# start before each solve. The start is taken as the incumbent, so a
+# time limited solve returns a schedule at least as good as the
+# previous one; what it saves is the model build, the branch and bound
+# that proves the optimum is not shorter than for a cold model (on
+# jobs.csv a re-solve takes about as long as a fresh build and solve)
+import time
+import pandas as pd
+import pyomo.environ as pyo
+from pyomo.contrib.appsi.solvers import Highs
+from job_table import loadJobs
+from schedule_bounds import startBounds, listSchedule
+from schedule_heuristic import heuristicSchedule
+
+
+class PersistentSchedule():
+    # problem1_2 formulation over dynamic sets, '' being the dummy start
+    # component names follow problem1_2 so its output functions apply
+    def __init__(self, dict_job, solver=None):
+        self.dict_job = dict(dict_job)
+        self.order = heuristicSchedule(self.dict_job, lexicographic=True)[0] if self.dict_job else []
+        self.opt = solver if solver is not None else Highs()
+        self.opt.config.warmstart = True
+        self.opt.config.load_solution = True
+
+        model = pyo.ConcreteModel()
+        self.model = model
+        list_job = list(self.dict_job.keys())
+
+        # define sets, every ordered pair is an arc so a job change can
+        # never cut off an arc needed later; the arcs in and out of every
+        # job are kept for its degree rows
+        arcs = [(j1, j2) for j1 in [''] + list_job for j2 in list_job if j1 != j2]
+        model.setJobs = pyo.Set(initialize=[''] + list_job)
+        model.setVars = pyo.Set(dimen=2, initialize=arcs)
+        self.dict_in = {j: [] for j in model.setJobs}
+        self.dict_out = {j: [] for j in model.setJobs}
+        for j1, j2 in arcs:
+            self.dict_in[j2].append(j1)
+            self.dict_out[j1].append(j2)
+
+        # define mutable job params and the big-M of every arc
+        model.parProcess = pyo.Param(model.setJobs, mutable=True, initialize=0)
+        model.parSetup = pyo.Param(model.setJobs, mutable=True, initialize=0)
+        model.parRelease = pyo.Param(model.setJobs, mutable=True, initialize=0)
+        model.parDeadline = pyo.Param(model.setJobs, mutable=True, initialize=0)
+        model.parBigM = pyo.Param(model.setVars, mutable=True, initialize=0)
+        model.parMaxDelay = pyo.Param(mutable=True, initialize=0)
+        for j in list_job:
+            self._setParams(self.dict_job[j])
+
+        # define variables
+        model.varSeq = pyo.Var(model.setVars, domain=pyo.Binary)
+        model.varTime = pyo.Var(model.setJobs, domain=pyo.NonNegativeReals)
+        model.varDelay = pyo.Var(model.setJobs, domain=pyo.NonNegativeReals)
+        model.varMakeSpan = pyo.Var(domain=pyo.NonNegativeReals)
+        self.bigM = {}
+        self._setBounds()
+
+        # define constraints, filled index by index
+        model.constrSingle = pyo.Constraint(model.setJobs)
+        model.constrNext = pyo.Constraint(model.setJobs)
+        model.constrTimeSeq = pyo.Constraint(model.setVars)
+        model.constrMakeSpan = pyo.Constraint(model.setVars)
+        model.constrDelay = pyo.Constraint(model.setJobs)
+        model.constrDeadline = pyo.Constraint(model.setJobs)
+        for arc in model.setVars:
+            self._setArc(*arc)
+        for j in model.setJobs:
+            self._setJob(j)
+            self._setDegree(j)
+
+        # define objectives and the total delay bound, the cutoff of the
+        # delay phase and the fixed delay of the makespan phase
+        model.obj1 = pyo.Objective(expr=0, sense=pyo.minimize)
+        model.obj2 = pyo.Objective(expr=model.varMakeSpan, sense=pyo.minimize)
+        model.constrMaxDelay = pyo.Constraint(expr=pyo.inequality(None, 0, model.parMaxDelay))
+        self._setTotals()
+        self._loadOrder(self.order)
+
+    def _setParams(self, job):
+        # copy the job attributes into the mutable params
+        model = self.model
+        model.parProcess[job.job] = job.process_time
+        model.parSetup[job.job] = job.setup_time
+        model.parRelease[job.job] = job.release_time
+        model.parDeadline[job.job] = job.deadline
+
+    def _setBounds(self, maxDelay=None):
+        # big-M of every arc as problem1_2 derives it from the start time
+        # windows: when the arc is unused the left side is at most the
+        # latest end of j1 plus the setup of j2 minus the earliest start
+        # of j2. With maxDelay, the total delay of a known schedule, no
+        # better schedule starts a job later than its deadline plus
+        # maxDelay, which tightens the latest starts; the arcs that can't
+        # be in such a schedule (the ArcIndex rule) are fixed to 0 rather
+        # than removed so the next job change can free them again, without
+        # maxDelay every arc is free. Only the params and fixings that
+        # change are touched
+        model = self.model
+        earliest, latest = startBounds(self.dict_job)
+        if maxDelay is not None:
+            for j, job in self.dict_job.items():
+                latest[j] = min(latest[j], job.deadline + maxDelay)
+        for j1, j2 in model.setVars:
+            job2 = self.dict_job[j2]
+            process1 = self.dict_job[j1].process_time if j1 != '' else 0
+            bigM = max(latest[j1] + process1 + job2.setup_time - earliest[j2], 0)
+            if self.bigM.get((j1, j2)) != bigM:
+                model.parBigM[j1, j2] = bigM
+                self.bigM[j1, j2] = bigM
+            start2 = max(earliest[j1] + process1 + job2.setup_time, earliest[j2])
+            fixed = maxDelay is not None and j1 != '' and start2 > latest[j2]
+            var = model.varSeq[j1, j2]
+            if fixed and not var.fixed:
+                var.fix(0)
+            elif var.fixed and not fixed:
+                var.unfix()
+
+    def _setArc(self, j1, j2):
+        # time sequence and makespan rows of one arc
+        model = self.model
+        model.constrTimeSeq[j1, j2] = (
+            model.varTime[j1]
+            + model.parProcess[j1]
+            + model.parSetup[j2]
+            - model.varTime[j2]
+            <=
+            (1 - model.varSeq[j1, j2]) * model.parBigM[j1, j2]
+        )
+        model.constrMakeSpan[j1, j2] = (
+            model.varTime[j2]
+            + model.parProcess[j2]
+            - model.varTime[j1]
+            - model.parSetup[j1]
+            <=
+            model.varMakeSpan
+        )
+
+    def _setJob(self, j):
+        # release and deadline rows of one job
+        if j == '':
+            return
+        model = self.model
+        model.constrDelay[j] = model.varTime[j] >= model.parRelease[j]
+        model.constrDeadline[j] = model.varTime[j] <= model.varDelay[j] + model.parDeadline[j]
+
+    def _setDegree(self, j):
+        # single start and single following job rows of one job from
+        # its arcs, replaced when they exist
+        model = self.model
+        if j != '':
+            expr = sum(model.varSeq[k, j] for k in self.dict_in[j]) == 1
+            if j in model.constrSingle:
+                model.constrSingle[j].set_value(expr)
+            else:
+                model.constrSingle[j] = expr
+        if j in model.constrNext:
+            del model.constrNext[j]
+        if self.dict_out[j]:
+            model.constrNext[j] = sum(model.varSeq[j, k] for k in self.dict_out[j]) <= 1
+
+    def _addArc(self, j1, j2):
+        # a new arc with its variable, big-M (set by the next bounds) and
+        # rows
+        model = self.model
+        model.setVars.add((j1, j2))
+        model.parBigM[j1, j2] = self.bigM[j1, j2] = 0
+        self._setArc(j1, j2)
+        self.dict_in[j2].append(j1)
+        self.dict_out[j1].append(j2)
+
+    def _setTotals(self):
+        # total delay objective and bound over the current jobs
+        model = self.model
+        totalDelay = sum(model.varDelay[j] for j in self.dict_job)
+        model.obj1.set_value(totalDelay)
+        model.constrMaxDelay.set_value(pyo.inequality(None, totalDelay, model.parMaxDelay))
+
+    def _loadOrder(self, order):
+        # load the list schedule of order as the mip start
+        model = self.model
+        start, _, end = listSchedule(self.dict_job, order)
+        for arc in model.setVars:
+            model.varSeq[arc].value = 0
+        for j1, j2 in zip([''] + order, order):
+            model.varSeq[j1, j2].value = 1
+        first = self.dict_job[order[0]] if order else None
+        model.varTime[''].value = start[first.job] - first.setup_time if order else 0
+        for j in order:
+            model.varTime[j].value = start[j]
+            model.varDelay[j].value = max(start[j] - self.dict_job[j].deadline, 0)
+        model.varDelay[''].value = 0
+        model.varMakeSpan.value = end - model.varTime[''].value
+
+    def _readOrder(self):
+        # follow the sequence arcs from the dummy start
+        model = self.model
+        order = []
+        j1 = ''
+        while len(order) < len(self.dict_job):
+            j1 = next(j2 for j2 in self.dict_out[j1]
+                if j2 not in order and model.varSeq[j1, j2].value > 0.5)
+            order.append(j1)
+        return order
+
+    def addJob(self, job):
+        # add the job params, arcs and rows, the start inserts the job at
+        # the cheapest position of the previous order; the rows of the
+        # other jobs only gain the terms of the new arcs
+        model = self.model
+        j = job.job
+        others = list(self.dict_job)
+        model.setJobs.add(j)
+        self.dict_job[j] = job
+        self.dict_in[j] = []
+        self.dict_out[j] = []
+        self._setParams(job)
+        self._addArc('', j)
+        for k in others:
+            self._addArc(k, j)
+            self._addArc(j, k)
+        self._setJob(j)
+        self._setDegree(j)
+        self._setDegree('')
+        for k in others:
+            constr = model.constrSingle[k]
+            constr.set_value(constr.body + model.varSeq[j, k] == 1)
+            if k in model.constrNext:
+                constr = model.constrNext[k]
+                constr.set_value(constr.body + model.varSeq[k, j] <= 1)
+            else:
+                model.constrNext[k] = model.varSeq[k, j] <= 1
+        self._setBounds()
+        self._setTotals()
+        self.order = min(
+            (self.order[:i] + [j] + self.order[i:] for i in range(len(self.order) + 1)),
+            key=lambda order: listSchedule(self.dict_job, order)[1:])
+        self._loadOrder(self.order)
+
+    def removeJob(self, j):
+        # drop the job arcs, rows, variables and params, the degree rows
+        # of the other jobs lose the terms of its arcs
+        model = self.model
+        for arc in [(k, j) for k in self.dict_in[j]] + [(j, k) for k in self.dict_out[j]]:
+            del model.constrTimeSeq[arc]
+            del model.constrMakeSpan[arc]
+            del model.varSeq[arc]
+            del model.parBigM[arc]
+            del self.bigM[arc]
+            model.setVars.remove(arc)
+        for component in [model.constrSingle, model.constrNext, model.constrDelay,
+                model.constrDeadline, model.varTime, model.varDelay, model.parProcess,
+                model.parSetup, model.parRelease, model.parDeadline]:
+            if j in component:
+                del component[j]
+        model.setJobs.remove(j)
+        del self.dict_job[j]
+        before, after = self.dict_in.pop(j), self.dict_out.pop(j)
+        for k in before:
+            self.dict_out[k].remove(j)
+        for k in after:
+            self.dict_in[k].remove(j)
+        for k in dict.fromkeys(before + after):
+            self._setDegree(k)
+        self._setBounds()
+        self._setTotals()
+        self.order = [k for k in self.order if k != j]
+        self._loadOrder(self.order)
+
+    def updateJob(self, job):
+        # only the params change, the previous order stays the start
+        self.dict_job[job.job] = job
+        self._setParams(job)
+        self._setBounds()
+        self._loadOrder(self.order)
+
+    def solve(self, timeLimit=None):
+        # minimize the total delay below the one of the start, then the
+        # makespan under that delay; timeLimit caps each phase, the start
+        # keeps it feasible
+        model = self.model
+        self.opt.config.time_limit = timeLimit
+        _, startDelay, _ = listSchedule(self.dict_job, self.order)
+        self._setBounds(startDelay + 1e-6)
+        model.parMaxDelay = startDelay + 1e-6
+        model.obj2.deactivate()
+        model.obj1.activate()
+        self.opt.solve(model)
+        totalDelay = pyo.value(model.obj1)
+
+        # small slack so the rounding of the first phase can't cut off
+        # its own solution, the optimal delay tightens the big-Ms again
+        model.parMaxDelay = totalDelay + 1e-6
+        self._setBounds(totalDelay + 1e-6)
+        model.obj1.deactivate()
+        model.obj2.activate()
+        self.opt.solve(model)
+
+        self.order = self._readOrder()
+        return round(totalDelay, 6), round(model.varMakeSpan.value, 6)
+
+    def schedule(self):
+        # start time and delay of every job in sequence order
+        model = self.model
+        return pd.DataFrame({
+            'cur_job': self.order,
+            'start': [model.varTime[j].value for j in self.order],
+            'delay': [model.varDelay[j].value for j in self.order]})
+
+
+if __name__ == '__main__':
+    # read input csv and create jobs objects
+    dict_job = loadJobs('jobs.csv')
+
+    # cold build and solve without the last job
+    list_job = list(dict_job.keys())
+    tic = time.perf_counter()
+    schedule = PersistentSchedule({j: dict_job[j] for j in list_job[:-1]})
+    totalDelay, makeSpan = schedule.solve()
+    print('cold: delay {} makespan {} in {:.2f}s'.format(
+        totalDelay, makeSpan, time.perf_counter() - tic))
+
+    # the last job arrives
+    tic = time.perf_counter()
+    schedule.addJob(dict_job[list_job[-1]])
+    totalDelay, makeSpan = schedule.solve()
+    print('add job: delay {} makespan {} in {:.2f}s'.format(
+        totalDelay, makeSpan, time.perf_counter() - tic))
+
+    # the first job is reprocessed for longer
+    job = dict_job[list_job[0]]
+    job.process_time += 5
+    tic = time.perf_counter()
+    schedule.updateJob(job)
+    totalDelay, makeSpan = schedule.solve()
+    print('update job: delay {} makespan {} in {:.2f}s'.format(
+        totalDelay, makeSpan, time.perf_counter() - tic))
+
+    # the first job is cancelled
+    tic = time.perf_counter()
+    schedule.removeJob(list_job[0])
+    totalDelay, makeSpan = schedule.solve()
+    print('remove job: delay {} makespan {} in {:.2f}s'.format(
+        totalDelay, makeSpan, time.perf_counter() - tic))
+    print(schedule.schedule())
@@ -0,0 +1,98 @@
+# This script schedules long job lists with the problem1_2 model over
+# rolling windows: jobs are taken by release time, each window is solved
+# as problem1_2, the first jobs of its sequence are committed and the
+# rest roll over into the next window, which starts when the machine is
+# free again
+import time
+import pyomo.environ as pyo
+from problem1_2 import buildVars, buildConstraints, buildObjective, fixDelay, loadStart, addCutoff
+from schedule_bounds import listSchedule, ArcIndex
+from job_table import JobRecord, loadJobs
+from schedule_heuristic import heuristicSchedule
+from solver_config import SolverConfig, loadSolution
+
+
+def shiftJob(job, ready):
+    # job times relative to the time the machine is free, the delay
+    # max(start - deadline, 0) is unchanged by the shift
+    return JobRecord(
+        job.job,
+        job.process_time,
+        job.setup_time,
+        max(job.release_time - ready, 0),
+        job.deadline - ready)
+
+
+def solvedOrder(model, dict_job):
+    # follow the sequence arcs of the solution from the dummy start
+    order = []
+    j1 = ''
+    while len(order) < len(dict_job):
+        j1 = next(j2 for j1_, j2 in model.setVars
+            if j1_ == j1 and j2 not in order and (model.varSeq[j1_, j2].value or 0) > 0.5)
+        order.append(j1)
+    return order
+
+
+def solveWindow(dict_job, config):
+    # lexicographic problem1_2 solve of one window seeded by the
+    # heuristic; a phase cut by the time limit of config still leaves a
+    # schedule
+    order, _, heurDelay, _, _ = heuristicSchedule(dict_job, lexicographic=True)
+    model = pyo.ConcreteModel()
+    buildVars(model, dict_job, ArcIndex(dict_job, maxDelay=heurDelay))
+    buildConstraints(model, dict_job)
+    buildObjective(model, dict_job)
+    loadStart(model, dict_job, order)
+    addCutoff(model, heurDelay)
+
+    # a phase that ends without a solution keeps the heuristic order, or
+    # the delay optimum when the makespan phase finds none
+    model.obj2.deactivate()
+    if not loadSolution(model, config.solve(model, load_solutions=False)):
+        return order
+    fixDelay(model, dict_job)
+    loadSolution(model, config.solve(model, load_solutions=False))
+    return solvedOrder(model, dict_job)
+
+
+def rollingSchedule(dict_job, windowSize=15, overlap=5, config=None):
+    # windows of windowSize jobs, the last overlap jobs of each window
+    # sequence are solved again with the next jobs; the boundary is the
+    # time the machine is free after the committed prefix (setups don't
+    # depend on the previous job, so the last job needs nothing more)
+    # the time limit of config caps each solve, which keeps the runtime
+    # linear in the number of jobs
+    if not 0 <= overlap < windowSize:
+        raise ValueError('overlap must be in [0, windowSize)')
+    config = SolverConfig('glpk') if config is None else config
+    queue = sorted(dict_job, key=lambda j: (dict_job[j].release_time, dict_job[j].deadline))
+    committed = []
+    ready = 0
+    carry = []
+    while queue or carry:
+        window = carry + queue[:windowSize - len(carry)]
+        queue = queue[windowSize - len(carry):]
+        order = solveWindow({j: shiftJob(dict_job[j], ready) for j in window}, config)
+
+        # commit everything on the last window, the machine is free again
+        # after the committed jobs run in the shifted times
+        keep = len(order) - overlap if queue else len(order)
+        _, _, end = listSchedule({j: shiftJob(dict_job[j], ready) for j in order[:keep]}, order[:keep])
+        ready += end
+        committed += order[:keep]
+        carry = order[keep:]
+    start, totalDelay, end = listSchedule(dict_job, committed)
+    return committed, start, totalDelay, end
+
+
+if __name__ == '__main__':
+    # read input csv and create jobs objects
+    dict_job = loadJobs('jobs.csv')
+
+    tic = time.perf_counter()
+    order, start, totalDelay, end = rollingSchedule(dict_job, windowSize=6, overlap=2)
+    print('rolling horizon in {:.2f}s'.format(time.perf_counter() - tic))
+    print('order: ', order)
+    print('total make span: ', end - (start[order[0]] - dict_job[order[0]].setup_time))
+    print('total delay: ', totalDelay)
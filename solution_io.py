@@ -0,0 +1,47 @@
+# This script reads solved variable values into dataframes in one pass
+# and writes them as csv, parquet, feather or xlsx, shared by the
+# solutionToPandas functions of problem1, problem1_2 and problem2
+import os
+import numpy as np
+import pandas as pd
+
+
+def varFrame(var, columns, threshold=None):
+    # index and value of an indexed variable as one dataframe, columns
+    # names the index positions; values are read into one float array
+    # (unset ones as nan) and the rows at or below threshold are dropped
+    # before any row is built
+    keys = list(var.keys())
+    values = np.array([v.value for v in var.values()], dtype=float)
+    mask = ~np.isnan(values) if threshold is None else values > threshold
+    kept = [keys[k] for k in np.flatnonzero(mask)]
+    if len(columns) == 1:
+        df = pd.DataFrame({columns[0]: kept})
+    else:
+        df = pd.DataFrame(dict(zip(columns, zip(*kept))) if kept else {c: [] for c in columns})
+    df['val'] = values[mask]
+    return df
+
+
+def writeFrames(frames, file):
+    # write named dataframes by the file extension: one sheet each for
+    # xlsx, one file each (stem_name.ext) for csv, parquet and feather,
+    # parquet and feather need pyarrow; no file writes nothing
+    if file is None:
+        return
+    stem, ext = os.path.splitext(file)
+    if ext == '.xlsx':
+        with pd.ExcelWriter(file, engine='openpyxl') as writer:
+            for name, df in frames.items():
+                df.to_excel(writer, sheet_name=name, index=False)
+        return
+    for name, df in frames.items():
+        path = file if len(frames) == 1 else '{}_{}{}'.format(stem, name, ext)
+        if ext == '.csv':
+            df.to_csv(path, index=False)
+        elif ext == '.parquet':
+            df.to_parquet(path, index=False)
+        elif ext == '.feather':
+            df.reset_index(drop=True).to_feather(path)
+        else:
+            raise ValueError('unknown output format: {}'.format(ext))
@@ -0,0 +1,101 @@
+# This script keeps the solver settings of the milps in one place: the
+# backend (glpk, cbc or highs, whichever is installed) with a time
+# limit, a relative gap, a thread count and a random seed, translated to
+# the option names of every backend
+import copy
+import math
+import pyomo.environ as pyo
+from instrument import traced, recordSolve
+
+# pyomo solver name and option names of every backend, None where the
+# backend has no such option (glpk runs on one thread)
+SOLVERS = {
+    'glpk': {'factory': 'glpk', 'timeLimit': 'tmlim', 'gap': 'mipgap', 'threads': None, 'seed': None},
+    'cbc': {'factory': 'cbc', 'timeLimit': 'sec', 'gap': 'ratio', 'threads': 'threads', 'seed': 'randomCbcSeed'},
+    'highs': {'factory': 'highs', 'timeLimit': 'time_limit', 'gap': 'mip_rel_gap', 'threads': 'threads',
+        'seed': 'random_seed'}}
+
+
+def availableSolvers():
+    # backends of SOLVERS installed here
+    return [name for name, solver in SOLVERS.items()
+        if pyo.SolverFactory(solver['factory']).available(exception_flag=False)]
+
+
+# termination conditions a solve can end with and still have a solution
+SOLVED = {'optimal', 'locallyOptimal', 'globallyOptimal', 'feasible', 'maxTimeLimit',
+    'maxIterations', 'maxEvaluations', 'userInterrupt', 'other'}
+
+
+def loadSolution(model, result):
+    # load the solution of a solve made with load_solutions=False, False
+    # when the solver stopped without one (a time limit before the first
+    # incumbent, infeasible, an error)
+    if len(result.solution) == 0 or str(result.solver.termination_condition) not in SOLVED:
+        return False
+    if str(result.solution(0).status) in ('infeasible', 'unbounded', 'error', 'unknown'):
+        return False
+    model.solutions.load_from(result)
+    return True
+
+
+@traced
+def solveWarm(opt, model, **kwds):
+    # solve from the loaded variable values when the solver takes a mip
+    # start (glpk doesn't, the cutoff row still prunes its search)
+    if opt.warm_start_capable():
+        result = opt.solve(model, warmstart=True, **kwds)
+    else:
+        result = opt.solve(model, **kwds)
+    recordSolve(result)
+    return result
+
+
+
+class SolverConfig():
+    # backend and limits of a solve: timeLimit in seconds, gap as the
+    # relative mip gap, threads and seed where the backend takes them
+    def __init__(self, name='glpk', timeLimit=None, gap=None, threads=None, seed=None, tee=False):
+        if name not in SOLVERS:
+            raise ValueError('unknown solver: {}'.format(name))
+        if seed is not None and SOLVERS[name]['seed'] is None:
+            raise ValueError('{} takes no random seed'.format(name))
+        self.name = name
+        self.timeLimit = timeLimit
+        self.gap = gap
+        self.threads = threads
+        self.seed = seed
+        self.tee = tee
+
+    def __repr__(self):
+        settings = ['{}={}'.format(k, getattr(self, k)) for k in ['timeLimit', 'gap', 'threads', 'seed']
+            if getattr(self, k) is not None]
+        return 'SolverConfig({})'.format(', '.join([repr(self.name)] + settings))
+
+    def options(self):
+        # the settings under the option names of the backend
+        names = SOLVERS[self.name]
+        options = {}
+        for key in ['timeLimit', 'gap', 'threads', 'seed']:
+            if getattr(self, key) is not None and names[key] is not None:
+                options[names[key]] = getattr(self, key)
+        return options
+
+    def limited(self, seconds):
+        # copy whose time limit is at most seconds, rounded up to whole
+        # seconds as glpk takes no fractions
+        config = copy.copy(self)
+        seconds = max(math.ceil(seconds), 1)
+        config.timeLimit = seconds if self.timeLimit is None else min(self.timeLimit, seconds)
+        return config
+
+    def factory(self):
+        # pyomo solver of the backend with the options set
+        opt = pyo.SolverFactory(SOLVERS[self.name]['factory'])
+        opt.options.update(self.options())
+        return opt
+
+    def solve(self, model, **kwds):
+        # solve from the loaded values when the backend takes a start
+        kwds.setdefault('tee', self.tee)
+        return solveWarm(self.factory(), model, **kwds)
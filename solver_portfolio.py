@@ -0,0 +1,168 @@
+# This script races solver configurations on one model: every config
+# builds its own copy of the model in a worker process and solves it,
+# the first proven optimum wins and the other workers are killed along
+# with their solver processes. Without one, the best solution found
+# within the time budget wins. The configs can be different backends or
+# seeds of one backend
+import os
+import time
+import queue
+import signal
+import multiprocessing
+import pyomo.environ as pyo
+import problem1
+import problem1_2
+import problem2
+from schedule_bounds import ArcIndex
+from schedule_heuristic import heuristicSchedule
+from solver_config import SolverConfig, availableSolvers
+from instrument import solverStats, record
+from job_table import loadJobs
+
+
+def buildProblem1(dict_job):
+    # problem1 model as its main builds it: heuristic start, pruned arcs
+    # and the heuristic objective as cutoff
+    order, _, _, _, (heurCost, _) = heuristicSchedule(dict_job)
+    model = pyo.ConcreteModel()
+    problem1.buildVars(model, dict_job, ArcIndex(dict_job, maxDelay=heurCost/99))
+    problem1.buildConstraints(model, dict_job)
+    problem1.buildObjective(model, dict_job)
+    problem1.loadStart(model, dict_job, order)
+    problem1.addCutoff(model, heurCost)
+    return model
+
+
+def buildProblem1_2(dict_job, totalDelay=None):
+    # problem1_2 model of the delay phase, of the makespan phase when
+    # totalDelay bounds the delay
+    order, _, heurDelay, _, _ = heuristicSchedule(dict_job, lexicographic=True)
+    model = pyo.ConcreteModel()
+    problem1_2.buildVars(model, dict_job, ArcIndex(dict_job, maxDelay=heurDelay))
+    problem1_2.buildConstraints(model, dict_job)
+    problem1_2.buildObjective(model, dict_job)
+    problem1_2.loadStart(model, dict_job, order)
+    problem1_2.addCutoff(model, heurDelay)
+    if totalDelay is None:
+        model.obj2.deactivate()
+    else:
+        problem1_2.fixDelay(model, dict_job, totalDelay)
+    return model
+
+
+def buildProblem2(containers, targets=None):
+    # problem2 model with a zero objective: highs reports no solution
+    # of a model without one unless it loads it right away
+    model = pyo.ConcreteModel()
+    problem2.buildVars(model, containers)
+    problem2.buildConstraints(model, containers, targets=targets)
+    model.obj = pyo.Objective(expr=0)
+    return model
+
+
+def modelValues(model):
+    # value of every variable by name
+    return {v.name: v.value for v in model.component_data_objects(pyo.Var)}
+
+
+def loadValues(model, values):
+    # set the variables of model to values by name
+    for v in model.component_data_objects(pyo.Var):
+        v.set_value(values.get(v.name), skip_validation=True)
+    return
+
+
+def _raceWorker(k, config, builder, args, results):
+    # build and solve one copy; the worker leads its own process group
+    # so the solver it starts is killed with it
+    os.setsid()
+    tic = time.perf_counter()
+    model = builder(*args)
+    result = config.solve(model, load_solutions=False)
+    values = None
+    if len(result.solution) > 0:
+        model.solutions.load_from(result)
+        values = modelValues(model)
+    results.put((k, solverStats(result), values, time.perf_counter() - tic))
+
+
+def _kill(process):
+    # stop a worker and every process of its group
+    if process.is_alive():
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except (ProcessLookupError, PermissionError):
+            pass
+        process.terminate()
+    process.join()
+
+
+def solvePortfolio(builder, args, configs, timeBudget=None):
+    # race the configs on builder(*args): the first proven optimal result
+    # stops the race, otherwise it ends when every config finished or
+    # timeBudget seconds passed and the lowest objective wins (any
+    # solution when the model has none). Returns the winning config,
+    # its solver statistics and a model holding its solution, None for
+    # both when no config found one
+    tic = time.perf_counter()
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_raceWorker, args=(k, config, builder, args, results))
+        for k, config in enumerate(configs)]
+    for process in processes:
+        process.start()
+
+    finished = {}
+    winner = None
+    try:
+        while len(finished) < len(configs):
+            left = None if timeBudget is None else timeBudget - (time.perf_counter() - tic)
+            if left is not None and left <= 0:
+                break
+            try:
+                k, stats, values, seconds = results.get(timeout=0.5 if left is None else min(0.5, left))
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes) and results.empty():
+                    break
+                continue
+            finished[k] = stats, values
+            print('{}: {} objective {} in {:.2f}s'.format(configs[k], stats['status'], stats['objective'], seconds))
+            record('portfolio', config=repr(configs[k]), wall=seconds, **stats)
+            if values is not None and stats['status'] == 'optimal':
+                winner = k
+                break
+    finally:
+        for process in processes:
+            _kill(process)
+
+    if winner is None:
+        found = [k for k, (stats, values) in finished.items() if values is not None]
+        if not found:
+            return None, None, None
+        winner = min(found, key=lambda k: (finished[k][0]['objective'] is None, finished[k][0]['objective'] or 0, k))
+    stats, values = finished[winner]
+    model = builder(*args)
+    loadValues(model, values)
+    print('portfolio winner {} after {:.2f}s'.format(configs[winner], time.perf_counter() - tic))
+    return configs[winner], stats, model
+
+
+def seedConfigs(name, seeds, **kwds):
+    # configs of one backend differing by the random seed only
+    return [SolverConfig(name, seed=seed, **kwds) for seed in seeds]
+
+
+if __name__ == '__main__':
+    # read input csv and create jobs objects
+    dict_job = loadJobs('jobs.csv')
+
+    # every installed backend and three seeds of highs when there
+    configs = [SolverConfig(name, timeLimit=120) for name in availableSolvers()]
+    if 'highs' in availableSolvers():
+        configs += seedConfigs('highs', [1, 2, 3], timeLimit=120)
+
+    config, stats, model = solvePortfolio(buildProblem1_2, (dict_job,), configs)
+    totalDelay = stats['objective']
+    config, stats, model = solvePortfolio(buildProblem1_2, (dict_job, totalDelay + 1e-6), configs)
+    df_varTime, df_varDelay = problem1_2.solutionToPandas(model)
+    print('total make span: ', model.varMakeSpan.value)
+    print('total delay: ', df_varDelay['val'].sum())
@@ -0,0 +1,28 @@
+# presolved problem2 models at the targets of generated instances
+import pytest
+import pyomo.environ as pyo
+from instance_gen import generateContainers
+from container_presolve import presolve, buildPresolved
+from solver_config import availableSolvers, SolverConfig
+
+SOLVERS = availableSolvers()
+
+
+@pytest.mark.skipif(not SOLVERS, reason='no milp solver installed')
+@pytest.mark.parametrize('seed', range(6))
+def test_presolved_meets_instance_targets(seed):
+    df_containers, targets = generateContainers(8, seed=seed)
+    reduced = presolve(df_containers, *targets)
+    assert reduced.targets == targets
+
+    model = pyo.ConcreteModel()
+    buildPresolved(model, reduced)
+    model.obj = pyo.Objective(expr=0)
+    result = SolverConfig(SOLVERS[0]).solve(model)
+    assert str(result.solver.termination_condition) == 'optimal'
+
+    count, weight, volume = targets
+    plan = [cop for cop, v in model.varPipes.items() if v.value > 0.5]
+    assert len({c for c, o, p in plan}) == count
+    assert sum(reduced.dict_cop[cop][0] for cop in plan) == pytest.approx(weight)
+    assert sum(reduced.dict_cop[cop][1] for cop in plan) == pytest.approx(volume)
@@ -0,0 +1,36 @@
+# problem3 constructors and the grasp under the side A limit
+import numpy as np
+import pandas as pd
+import pytest
+import problem3
+
+
+@pytest.mark.parametrize('method', sorted(problem3.CONSTRUCTORS))
+@pytest.mark.parametrize('lanes', [2, 3])
+@pytest.mark.parametrize('seed', range(5))
+def test_constructors_keep_side_max(method, lanes, seed):
+    rng = np.random.default_rng(seed)
+    length = rng.integers(20, 60, 30) / 10
+    for sideMax in [0, 5, 15, float(length.sum()) / lanes]:
+        side = problem3.CONSTRUCTORS[method](length, lanes, sideMax)
+        assert set(np.unique(side)) <= set(range(lanes))
+        assert length[side == 0].sum() <= sideMax + 1e-9
+
+
+@pytest.mark.parametrize('method', sorted(problem3.CONSTRUCTORS))
+def test_constructors_case_side_max(method):
+    side = problem3.CONSTRUCTORS[method](problem3.df_cars['length'], 2, 15)
+    assert problem3.df_cars['length'].to_numpy()[side == 0].sum() <= 15 + 1e-9
+
+
+def test_grasp_seeds_keep_side_max():
+    df_best = problem3.loopGRASP(problem3.df_cars, 5, 20, 0.75, 15, seed=0, seeds=('lpt', 'kk'), plot=False)
+    assert problem3.calculateCost(df_best)[1] <= 15 + 1e-9
+
+
+def test_grasp_pool_matches_serial(monkeypatch):
+    serial = problem3.loopGRASP(problem3.df_cars, 10, 20, 0.75, 15, seed=0, plot=False)
+    monkeypatch.setattr(problem3.os, 'cpu_count', lambda: 2)
+    monkeypatch.setattr(problem3, 'POOL_SECONDS', 0)
+    pooled = problem3.loopGRASP(problem3.df_cars, 10, 20, 0.75, 15, seed=0, workers=2, plot=False)
+    pd.testing.assert_frame_equal(serial, pooled)
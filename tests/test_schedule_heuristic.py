@@ -0,0 +1,17 @@
+# the local search keeps its times consistent and the pass cap only stops it early
+import pytest
+from instance_gen import generateJobs
+from schedule_bounds import listSchedule
+from schedule_heuristic import heuristicSchedule
+
+
+@pytest.mark.parametrize('seed', range(4))
+@pytest.mark.parametrize('lexicographic', [False, True])
+def test_passes(seed, lexicographic):
+    dict_job = generateJobs(200, seed=seed)
+    capped = heuristicSchedule(dict_job, lexicographic, passes=1)
+    full = heuristicSchedule(dict_job, lexicographic, passes=None)
+    for order, _, totalDelay, _, _ in (capped, full):
+        assert sorted(order) == sorted(dict_job)
+        assert listSchedule(dict_job, order)[1] == pytest.approx(totalDelay)
+    assert full[4] <= capped[4]
@@ -0,0 +1,21 @@
+# pareto levels that run out of time are left out of the front
+import pytest
+from instance_gen import generateJobs
+from schedule_pareto import paretoFront, _frontWorker
+from schedule_heuristic import heuristicSchedule
+from solver_config import availableSolvers, SolverConfig
+
+
+@pytest.mark.skipif('highs' not in availableSolvers(), reason='highs is not installed')
+def test_level_without_solution_is_none():
+    dict_job = generateJobs(12, seed=3)
+    order = heuristicSchedule(dict_job, lexicographic=True)[0]
+    assert _frontWorker(dict_job, None, order, SolverConfig('highs', timeLimit=0.01)) is None
+
+
+@pytest.mark.skipif('highs' not in availableSolvers(), reason='highs is not installed')
+def test_front_under_time_limit():
+    dict_job = generateJobs(12, seed=3)
+    df_front = paretoFront(dict_job, points=3, workers=1, config=SolverConfig('highs', timeLimit=0.01))
+    assert len(df_front) >= 1
+    assert df_front[['total_delay', 'make_span']].notna().all().all()
@@ -0,0 +1,21 @@
+# the previous schedule is the incumbent of every solve
+import pytest
+from instance_gen import generateJobs
+from schedule_bounds import listSchedule
+from solver_config import availableSolvers
+
+
+@pytest.mark.skipif('highs' not in availableSolvers(), reason='highs is not installed')
+def test_start_is_incumbent():
+    from schedule_persistent import PersistentSchedule
+    dict_job = generateJobs(8, seed=1)
+    list_job = list(dict_job)
+    schedule = PersistentSchedule({j: dict_job[j] for j in list_job[:-1]})
+    _, startDelay, _ = listSchedule(schedule.dict_job, schedule.order)
+    totalDelay, _ = schedule.solve(timeLimit=0.01)
+    assert totalDelay <= startDelay + 1e-6
+    schedule.addJob(dict_job[list_job[-1]])
+    _, startDelay, _ = listSchedule(schedule.dict_job, schedule.order)
+    totalDelay, _ = schedule.solve(timeLimit=0.01)
+    assert totalDelay <= startDelay + 1e-6
+    assert sorted(schedule.order) == sorted(dict_job)
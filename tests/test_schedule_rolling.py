@@ -0,0 +1,19 @@
+# rolling windows that run out of time keep a schedule
+import pytest
+from instance_gen import generateJobs
+from schedule_rolling import solveWindow, rollingSchedule
+from solver_config import availableSolvers, SolverConfig
+
+
+@pytest.mark.skipif('highs' not in availableSolvers(), reason='highs is not installed')
+def test_window_without_incumbent_keeps_heuristic_order():
+    dict_job = generateJobs(12, seed=3)
+    order = solveWindow(dict_job, SolverConfig('highs', timeLimit=0.01))
+    assert sorted(order) == sorted(dict_job)
+
+
+@pytest.mark.skipif('highs' not in availableSolvers(), reason='highs is not installed')
+def test_rolling_schedule_under_time_limit():
+    dict_job = generateJobs(20, seed=1)
+    order, start, totalDelay, end = rollingSchedule(dict_job, 8, 3, SolverConfig('highs', timeLimit=0.01))
+    assert sorted(order) == sorted(dict_job)